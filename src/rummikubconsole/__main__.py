@@ -1,11 +1,16 @@
+from pathlib import Path
+from time import perf_counter
+from typing import Optional, Tuple
+
 import click
 
 from . import __version__
-from .console import SolverConsole
+from .console import SAVEPATH, SolverConsole, calibrated_backend
 from .ruleset import RuleSet
+from .types import SolverBackend, SolverPreset
 
 
-@click.command(help="Rummikub Solver console")
+@click.group(help="Rummikub Solver console", invoke_without_command=True)
 @click.option(
     "--numbers",
     default=13,
@@ -53,15 +58,40 @@ from .ruleset import RuleSet
     type=click.IntRange(1, 50),
     help="Minimal tile sum required as opening move",
 )
+@click.option(
+    "--solver",
+    type=click.Choice([b.value for b in SolverBackend]),
+    help=(
+        "Solver backend to use; compact, jokerslots and colgen only solve "
+        "single moves, and leave the other solves to highs [default: the "
+        "fastest for the rules]"
+    ),
+)
+@click.option(
+    "--preset",
+    default=SolverPreset.EXACT.value,
+    show_default=True,
+    type=click.Choice([p.value for p in SolverPreset]),
+    help="Solve quality, trading optimality for speed",
+)
 @click.version_option(__version__)
+@click.pass_context
 def rsconsole(
+    ctx: click.Context,
     numbers: int = 13,
     repeats: int = 2,
     colours: int = 4,
     jokers: int = 2,
     min_len: int = 3,
     min_initial_value: int = 30,
+    solver: Optional[str] = None,
+    preset: str = SolverPreset.EXACT.value,
 ):
+    if ctx.invoked_subcommand is not None:
+        return
+    # HiGHS is quick to set up, so the ruleset starts out with that backend
+    # until the calibrated backend is known.
+    backend = SolverBackend.HIGHS if solver is None else SolverBackend(solver)
     ruleset = RuleSet(
         numbers=numbers,
         repeats=repeats,
@@ -69,7 +99,12 @@ def rsconsole(
         jokers=jokers,
         min_len=min_len,
         min_initial_value=min_initial_value,
+        backend=backend,
+        cache_dir=SAVEPATH,
+        preset=SolverPreset(preset),
     )
+    if solver is None:
+        ruleset.backend = calibrated_backend(ruleset)
     cmd = SolverConsole(
         ruleset=ruleset,
         # be tolerant of input character errors, don't break the console
@@ -79,5 +114,46 @@ def rsconsole(
     cmd.cmdloop()
 
 
+@rsconsole.command(
+    "replay-problems", help="Solve exported problems again, timing each solve"
+)
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option(
+    "--solver",
+    "solvers",
+    multiple=True,
+    type=click.Choice([b.value for b in SolverBackend]),
+    help="Solver backend to use, repeat to compare backends [default: highs]",
+)
+def replay_problems(directory: Path, solvers: Tuple[str, ...] = ()):
+    backends = [SolverBackend(s) for s in solvers] or [SolverBackend.HIGHS]
+    paths = sorted(
+        p for p in directory.iterdir() if p.suffix.lower() in {".mps", ".lp"}
+    )
+    totals = dict.fromkeys(backends, 0.0)
+    click.echo(
+        click.style(f"{'Problem':30} {'Solver':12} {'Time':>9} Tiles", bold=True)
+    )
+    for path in paths:
+        for backend in backends:
+            try:
+                ruleset, mode, state = RuleSet.load_problem(
+                    path, backend=backend, cache_dir=SAVEPATH
+                )
+            except ValueError as exc:
+                click.echo(f"Skipping {exc}")
+                break
+            start = perf_counter()
+            sol = ruleset.solve(state, mode)
+            elapsed = perf_counter() - start
+            totals[backend] += elapsed
+            tiles = len(sol.tiles) if sol else 0
+            click.echo(f"{path.name:30} {backend.value:12} {elapsed:8.3f}s {tiles:5}")
+    for backend, total in totals.items():
+        click.echo(f"{'Total':30} {backend.value:12} {total:8.3f}s")
+
+
 if __name__ == "__main__":
     rsconsole()
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+import multiprocessing
+import signal
+from collections import Counter
+from multiprocessing.pool import AsyncResult, Pool
+from typing import Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .ruleset import RuleSet
+
+
+# ruleset used by the background solver worker process
+_worker_ruleset: Optional[RuleSet] = None
+
+
+def _init_worker(kwargs: dict[str, Any]) -> None:
+    global _worker_ruleset
+    from .ruleset import RuleSet
+
+    # Ctrl-C is sent to the whole process group; only the console decides
+    # what to cancel.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_ruleset = RuleSet(**kwargs)
+
+
+def _call_in_worker(
+    method: str, args: tuple[Any, ...], kwargs: dict[str, Any]
+) -> tuple[Any, Counter[str]]:
+    """Call a ruleset method, returns the result and the solver stats added"""
+    assert _worker_ruleset is not None
+    before = _worker_ruleset.stats.copy()
+    result = getattr(_worker_ruleset, method)(*args, **kwargs)
+    return result, _worker_ruleset.stats - before
+
+
+class BackgroundSolver:
+    """Run ruleset solves in a worker process, so they can be cancelled
+
+    Solves are handed to a single worker process with its own copy of the
+    ruleset. Cancelling a solve terminates the worker and starts a new one.
+    The solver statistics collected by the worker are added to the ruleset
+    statistics as results are collected.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self._pool: Optional[Pool] = None
+
+    def submit(self, method: str, *args: Any, **kwargs: Any) -> AsyncResult:
+        """Call a ruleset method in the worker process
+
+        Pass the async result to result() to collect the return value.
+
+        """
+        if self._pool is None:
+            self._start()
+        assert self._pool is not None
+        return self._pool.apply_async(_call_in_worker, (method, args, kwargs))
+
+    def result(self, pending: AsyncResult) -> Any:
+        """The return value of a ruleset method called in the worker process"""
+        result, stats = pending.get()
+        self._ruleset.stats.update(stats)
+        return result
+
+    def cancel(self) -> None:
+        """Cancel all solves in progress, by terminating the worker process
+
+        A new worker process is started straight away, so it is ready by the
+        time the next solve comes in.
+
+        """
+        self.close()
+        self._start()
+
+    def close(self) -> None:
+        """Terminate the worker process"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _start(self) -> None:
+        self._pool = multiprocessing.Pool(
+            1, initializer=_init_worker, initargs=(self._ruleset._worker_kwargs(),)
+        )
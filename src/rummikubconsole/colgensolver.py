@@ -0,0 +1,374 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+import heapq
+from collections import Counter
+from itertools import combinations
+from math import inf
+from typing import Iterator, Optional, TYPE_CHECKING
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+from .gamestate import GameState
+from .limits import _PRESETS, _Limits, _milp_gap, _milp_options
+from .sets import _run_tuple
+from .types import SolverMode, SolverPreset, SolverSolution
+
+if TYPE_CHECKING:
+    from .ruleset import RuleSet
+
+
+# Objective cost per unit of an artificial variable; these let the restricted
+# master problem start out feasible without any sets.
+_PENALTY = 1e5
+# Columns added to the restricted master problem per pricing round
+_BATCH = 200
+# Numerical tolerance for reduced costs
+_EPS = 1e-6
+
+
+class ColumnGenerationSolver:
+    """Solver that generates sets on demand instead of enumerating them up front
+
+    Starts from a restricted master problem without any sets. Artificial
+    variables keep it feasible until sets cover the tiles on the table. The
+    LP relaxation is solved with HiGHS, and the duals of the tile and meld
+    value constraints price runs and groups directly from the rules. Sets
+    that improve the LP objective are added, until none are left.
+
+    The MILP over the generated sets is then solved. Any set that could
+    still improve on that solution must have a reduced cost below the gap
+    between the LP bound and the MILP objective. All such sets are added and
+    the MILP is solved again, so the solution is optimal without ever listing
+    RuleSet.sets.
+
+    With a deadline, a time.monotonic() value, pricing and the MILP solves
+    stop when the time is up, and the best solution found so far is used.
+    The solve quality preset sets the MILP gap, node limit and presolve.
+    Solutions that are not proven optimal have their gap measured against
+    the LP bound, or inf if there was no time to finish pricing the LP
+    relaxation and so no bound.
+
+    Only single solves (__call__) are column generated. Opening turns, table
+    arrangements, alternative solutions, the pareto front, quick answers and
+    problem exports are not implemented here; RuleSet hands these to the
+    HiGHS backend, which does enumerate RuleSet.sets.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self.stats: Counter[str] = Counter()
+        self._tcount = ruleset.tile_count
+        n = ruleset.numbers
+        tilevalue = np.tile(np.arange(1, n + 1, dtype=np.float64), ruleset.colours)
+        tilecount = np.ones(self._tcount)
+        numbertiles = tilecount.copy()
+        if ruleset.joker is not None:
+            tilevalue = np.append(tilevalue, 0)
+            numbertiles[-1] = 0
+        # negated, to turn these into minimization problems
+        self._objectives = {
+            SolverMode.TILE_COUNT: -tilecount,
+            SolverMode.TOTAL_VALUE: -tilevalue,
+            SolverMode.INITIAL: -numbertiles,
+        }
+
+    def __call__(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> SolverSolution:
+        """Find a solution for the given game state
+
+        Uses the appropriate objective for the given solver mode, and takes
+        the rack tile count and table tile count from state.
+
+        """
+        self.stats["solves"] += 1
+        limits = _PRESETS[preset]._replace(deadline=deadline)
+        problem = _Problem(self, mode, state, limits)
+        if not problem.relax():
+            if limits.expired():
+                return SolverSolution((), (), inf)
+            # even the LP relaxation can't cover the table or reach the
+            # initial meld value
+            return SolverSolution((), ())
+
+        # make sure there is an integer solution among the generated sets
+        threshold = 1.0
+        while (objective := problem.solve()) is None:
+            if limits.expired():
+                return SolverSolution((), (), inf)
+            # sets with a higher reduced cost can still make the MILP feasible,
+            # there is no solution only if no set at all is left to add.
+            while not problem.add(problem.price(threshold, None)):
+                if threshold == inf:
+                    return SolverSolution((), ())
+                threshold = threshold * 2 if threshold < _PENALTY else inf
+            threshold *= 2
+
+        # only sets with a reduced cost under the gap can improve on this; the
+        # objective values are integers, so they must improve by at least 1.
+        gap = objective - problem.bound - 1 + _EPS
+        optimal = problem.optimal
+        if gap > 0 and optimal:
+            if limits.expired():
+                optimal = False
+            elif problem.add(problem.price(gap, None)):
+                problem.solve()
+                optimal = problem.optimal
+        return problem.solution(optimal)
+
+    def _runs(
+        self, y: np.ndarray, w: float, threshold: float, available: np.ndarray
+    ) -> Iterator[tuple[float, tuple[int, ...]]]:
+        """Runs with a reduced cost below the threshold, as (-cost, set) tuples"""
+        rs = self._ruleset
+        n, mlen, joker = rs.numbers, rs.min_len, rs.joker
+        jokers = int(available[joker - 1]) if joker is not None else 0
+        yj = y[joker - 1] if joker is not None else 0.0
+        for c, length in np.ndindex(rs.colours, mlen):
+            length += mlen
+            for start in range(1, n - length + 2):
+                tiles = range(c * n + start, c * n + start + length)
+                nums = range(start, start + length)
+                real = [
+                    y[t - 1] + w * num if available[t - 1] else -np.inf
+                    for t, num in zip(tiles, nums)
+                ]
+                joker_scores = [yj + w * num for num in nums]
+                if length == mlen:
+                    slots = range(length)
+                else:
+                    # longer runs only take jokers in inner positions
+                    slots = range(1, length - 1)
+                for count in range(min(jokers, len(slots), length - 1) + 1):
+                    for js in combinations(slots, count):
+                        score = sum(
+                            joker_scores[p] if p in js else real[p]
+                            for p in range(length)
+                        )
+                        if score > -threshold:
+                            placed = list(tiles)
+                            for p in js:
+                                placed[p] = joker
+                            yield score, _run_tuple(placed, mlen, joker)
+
+    def _groups(
+        self, y: np.ndarray, w: float, threshold: float, available: np.ndarray
+    ) -> Iterator[tuple[float, tuple[int, ...]]]:
+        """Groups with a reduced cost below the threshold, as (-cost, set) tuples"""
+        rs = self._ruleset
+        n, mlen, joker = rs.numbers, rs.min_len, rs.joker
+        jokers = int(available[joker - 1]) if joker is not None else 0
+        yj = y[joker - 1] if joker is not None else 0.0
+        for num in range(1, n + 1):
+            tiles = [
+                c * n + num for c in range(rs.colours) if available[c * n + num - 1]
+            ]
+            for size in range(max(1, mlen - jokers), len(tiles) + 1):
+                # only groups of the minimal length take jokers, and only if
+                # there are as many colours as the minimal length
+                count = max(0, mlen - size)
+                if count and mlen > rs.colours:
+                    continue
+                extra = count * yj + w * (size + count) * num
+                for reals in combinations(tiles, size):
+                    score = extra + sum(y[t - 1] for t in reals)
+                    if score > -threshold:
+                        yield score, (*reals, *(joker,) * count)
+        if joker is not None and jokers >= mlen:
+            score = mlen * (yj + w * n)
+            if score > -threshold:
+                yield score, (joker,) * mlen
+
+
+class _Problem:
+    """Restricted master problem for a single game state"""
+
+    def __init__(
+        self,
+        solver: ColumnGenerationSolver,
+        mode: SolverMode,
+        state: GameState,
+        limits: _Limits,
+    ) -> None:
+        ruleset = self._ruleset = solver._ruleset
+        self._solver = solver
+        self._limits = limits
+        tcount = self._tcount = solver._tcount
+        self._initial = mode is SolverMode.INITIAL
+        if self._initial:
+            # can't use tiles on the table
+            self._table = np.zeros(tcount)
+            self._available = state.rack_array
+        else:
+            self._table = state.table_array.astype(np.float64)
+            self._available = state.rack_array + state.table_array
+        self._rack = state.rack_array
+        self._tile_costs = solver._objectives[mode]
+        self._repeats = ruleset.repeats
+        self._sets: list[tuple[int, ...]] = []
+        self._known: set[tuple[int, ...]] = set()
+        self._values: list[int] = []
+        self._ub: list[int] = []
+        self.bound = 0.0
+        self._x: np.ndarray = np.zeros(0)
+        self._objective = inf
+        # the last MILP solve was optimal over the generated sets, within the
+        # MILP gap of the preset
+        self.optimal = False
+        self._mip_gap = inf
+
+    def _matrix(self) -> sparse.csc_matrix:
+        """Tile counts per set, one column per generated set"""
+        rows = [t - 1 for s in self._sets for t in s]
+        cols = np.repeat(np.arange(len(self._sets)), [len(s) for s in self._sets])
+        return sparse.csc_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(self._tcount, len(self._sets))
+        )
+
+    def add(self, columns: Iterator[tuple[float, tuple[int, ...]]]) -> int:
+        """Add sets to the master problem, returns the number of sets added"""
+        added = 0
+        for _, s in columns:
+            if s in self._known:
+                continue
+            counts = Counter(s)
+            self._known.add(s)
+            self._sets.append(s)
+            self._values.append(self._ruleset.set_value(s))
+            self._ub.append(
+                min(
+                    self._repeats,
+                    *(self._available[t - 1] // c for t, c in counts.items()),
+                )
+            )
+            added += 1
+        self._solver.stats["columns"] += added
+        return added
+
+    def price(
+        self, threshold: float, limit: Optional[int] = _BATCH
+    ) -> Iterator[tuple[float, tuple[int, ...]]]:
+        """Sets with a reduced cost below threshold, given the current duals
+
+        With a limit, only produces that many sets with the lowest reduced cost.
+
+        """
+        solver, y, w, available = self._solver, self._y, self._w, self._available
+        candidates = (
+            *solver._runs(y, w, threshold, available),
+            *solver._groups(y, w, threshold, available),
+        )
+        self._solver.stats["priced"] += len(candidates)
+        if limit is None:
+            return iter(candidates)
+        return iter(heapq.nlargest(limit, candidates))
+
+    def _constraints(
+        self, artificial: bool
+    ) -> tuple[np.ndarray, sparse.csr_matrix, np.ndarray, np.ndarray]:
+        """Objective, constraint matrix, row lower bounds and column upper bounds
+
+        Columns are tiles, sets and, optionally, an artificial variable per
+        row. The rows are per tile, plus the initial meld value in initial
+        mode; tile rows are equalities, the meld value row has no upper bound.
+
+        """
+        tcount, slen = self._tcount, len(self._sets)
+        blocks = [[-sparse.eye(tcount), self._matrix()]]
+        lb = self._table
+        if self._initial:
+            values = np.array([self._values], dtype=np.float64)
+            blocks.append([None, sparse.csr_matrix(values)])
+            lb = np.append(lb, self._ruleset.min_initial_value)
+        matrix = sparse.bmat(blocks, format="csr")
+        cost = np.concatenate([self._tile_costs, np.zeros(slen)])
+        col_ub = np.concatenate([self._rack, self._ub]).astype(np.float64)
+        if artificial:
+            matrix = sparse.hstack([matrix, sparse.eye(len(lb))], format="csr")
+            cost = np.append(cost, np.full(len(lb), _PENALTY))
+            col_ub = np.append(col_ub, np.full(len(lb), np.inf))
+        return cost, matrix, lb, col_ub
+
+    def relax(self) -> bool:
+        """Solve the LP relaxation, generating sets until none improve it
+
+        Returns False if the relaxation has no solution without artificial
+        variables. If the deadline passes before the sets stop improving the
+        relaxation, the bound is -inf.
+
+        """
+        while True:
+            self._solver.stats["iterations"] += 1
+            cost, matrix, lb, col_ub = self._constraints(artificial=True)
+            res = linprog(
+                cost,
+                A_eq=matrix[: self._tcount],
+                b_eq=lb[: self._tcount],
+                A_ub=-matrix[self._tcount :] if self._initial else None,
+                b_ub=-lb[self._tcount :] if self._initial else None,
+                bounds=np.column_stack([np.zeros_like(col_ub), col_ub]),
+                method="highs",
+            )
+            self._y = res.eqlin.marginals
+            self._w = -res.ineqlin.marginals[0] if self._initial else 0.0
+            if not self.add(self.price(_EPS)):
+                self.bound = res.fun
+                break
+            if self._limits.expired():
+                self.bound = -inf
+                break
+        return bool(res.x[self._tcount + len(self._sets) :].max(initial=0) < _EPS)
+
+    def solve(self) -> Optional[float]:
+        """Solve the MILP over the generated sets, returns the objective value
+
+        Keeps the best solution so far, as solves cut short by the deadline
+        may produce a worse solution or none at all. The objective value is
+        None if there is no solution yet.
+
+        """
+        cost, matrix, lb, col_ub = self._constraints(artificial=False)
+        ub = lb.copy()
+        if self._initial:
+            ub[-1] = np.inf
+        res = milp(
+            cost,
+            integrality=np.ones_like(cost),
+            bounds=Bounds(0, col_ub),
+            constraints=LinearConstraint(matrix, lb, ub),
+            options=_milp_options(self._limits),
+        )
+        self._solver.stats["nodes"] += getattr(res, "mip_node_count", None) or 0
+        self.optimal = res.status == 0
+        self._mip_gap = _milp_gap(res)
+        if res.x is not None and res.fun < self._objective:
+            self._x = np.rint(res.x).astype(int)
+            self._objective = res.fun
+        return None if self._objective == inf else self._objective
+
+    def solution(self, optimal: bool) -> SolverSolution:
+        """The tiles placed and sets formed in the best MILP solution
+
+        With optimal set, the gap of the last MILP solve holds for all sets.
+        Otherwise the gap is measured against the LP bound, as the MILP bound
+        only covers the generated sets.
+
+        """
+        tcount, counts = self._tcount, self._x
+        (tidx,) = counts[:tcount].nonzero()
+        tiles = np.repeat(tidx + 1, counts[tidx]).tolist()
+        sets = [
+            s for s, count in zip(self._sets, counts[tcount:]) for _ in range(count)
+        ]
+        gap = self._mip_gap
+        if not optimal:
+            objective = self._objective
+            gap = (objective - self.bound) / abs(objective) if objective else inf
+        return SolverSolution(tiles, sorted(sets), gap)
@@ -0,0 +1,609 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+from collections import Counter, defaultdict
+from itertools import combinations
+from math import inf
+from typing import Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from .gamestate import GameState
+from .limits import _PRESETS, _milp_gap, _milp_options
+from .sets import _run_tuple
+from .types import SolverMode, SolverPreset, SolverSolution
+
+if TYPE_CHECKING:
+    from .ruleset import RuleSet
+
+    # length, first tile is a joker, last tile is a joker, has a real tile
+    RunState = tuple[int, bool, bool, bool]
+    # colour, number, state before, action, state after
+    Arc = tuple[int, int, Optional[RunState], int, Optional[RunState]]
+
+# run arc actions; start or extend with a tile or a joker, or end the run
+_TILE, _JOKER, _END = range(3)
+
+
+def _is_run(tiles: Sequence[int], numbers: int) -> bool:
+    """Is a set of real tiles a run, with all its tiles in the same colour"""
+    return (tiles[0] - 1) // numbers == (tiles[-1] - 1) // numbers
+
+
+class CompactSolver:
+    """Solver using a compact model that doesn't enumerate every run
+
+    Runs are modelled as flows over the tile numbers of each colour. Per
+    number, integer variables count how many partial runs in a given state
+    (length and where jokers were used) are extended with a tile or a joker,
+    are ended, or are started. Flow conservation per state links consecutive
+    numbers, and the states apply the same joker rules as the ruleset sets.
+    The number of variables grows linearly with ruleset.numbers, instead of
+    with every combination of run length, start number and joker positions.
+
+    Groups are modelled per number, as a fixed number of group slots each
+    with a binary variable per colour and a joker count, with constraints
+    limiting the group size and where jokers can be used. This avoids
+    enumerating every combination of colours. The model is solved with HiGHS
+    via scipy.optimize.milp, after which the runs are recovered by following
+    the flows and the groups are read from the slots.
+
+    Only solves for a single move use the compact model. The ruleset hands
+    opening turns, table arrangements, alternative solutions, the pareto
+    front, quick answers and exports to the HiGHS backend instead.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self.stats: Counter[str] = Counter()
+        n, joker = ruleset.numbers, ruleset.joker
+        tcount = self._tcount = ruleset.tile_count
+
+        # variables: tiles placed from the rack, run arcs, then groups
+        arcs: list[Arc] = []
+        states: list[set[RunState]] = [set()]  # per number, after that number
+        for num in range(1, n + 1):
+            reached: set[RunState] = set()
+            for state in states[-1]:
+                for joker_used in (False, True):
+                    if joker_used and joker is None:
+                        continue
+                    new = self._extend(state, joker_used)
+                    if new is not None:
+                        reached.add(new)
+            reached.add((1, False, False, True))
+            if joker is not None:
+                reached.add((1, True, False, False))
+            states.append(reached)
+
+        for c in range(ruleset.colours):
+            for num in range(1, n + 1):
+                arcs.append((c, num, None, _TILE, (1, False, False, True)))
+                if joker is not None:
+                    arcs.append((c, num, None, _JOKER, (1, True, False, False)))
+                for state in sorted(states[num - 1]):
+                    for action, joker_used in ((_TILE, False), (_JOKER, True)):
+                        if joker_used and joker is None:
+                            continue
+                        new = self._extend(state, joker_used)
+                        if new is not None:
+                            arcs.append((c, num, state, action, new))
+                for state in sorted(states[num]):
+                    if self._can_end(state):
+                        arcs.append((c, num, state, _END, None))
+        self._arcs = arcs
+
+        # Groups are modelled per number, with a fixed number of group slots.
+        # Each slot has a binary variable per colour (is the tile of that
+        # colour part of the group), a joker count, a binary for the slot
+        # being used and a binary for the group including jokers. Only groups
+        # of the minimal length can include jokers. Sets made up of only
+        # jokers get a single variable.
+        cs, mlen, jokers = ruleset.colours, ruleset.min_len, ruleset.jokers
+        slots = self._slots = (ruleset.repeats * cs + jokers) // mlen
+        slot_width = cs + 3
+        self._arcs_start, self._groups_start = tcount, tcount + len(arcs)
+        self._jokersets = self._groups_start + n * slots * slot_width
+        nvars = self._jokersets + 1
+
+        # rows: per tile, tiles used in runs and groups minus tiles placed
+        # from the rack equals the table count, then one row for the initial
+        # meld value, then flow conservation per colour, number and state,
+        # then the rows defining valid groups.
+        value_row = tcount
+        flow_rows: dict[tuple[int, int, RunState], int] = {}
+        rows, cols, data = [], [], []
+
+        def add(row: int, col: int, value: float) -> None:
+            rows.append(row)
+            cols.append(col)
+            data.append(value)
+
+        def flow_row(c: int, num: int, state: RunState) -> int:
+            key = (c, num, state)
+            if key not in flow_rows:
+                flow_rows[key] = value_row + 1 + len(flow_rows)
+            return flow_rows[key]
+
+        for t in range(tcount):
+            add(t, t, -1.0)
+        for i, (c, num, before, action, after) in enumerate(arcs, self._arcs_start):
+            if action != _END:
+                row = c * n + num - 1 if action == _TILE else tcount - 1
+                add(row, i, 1.0)
+                add(value_row, i, num)
+            if before is not None:
+                # leaving the state reached at the previous number, or at
+                # this number when ending the run
+                add(flow_row(c, num - (action != _END), before), i, -1.0)
+            if after is not None:
+                add(flow_row(c, num, after), i, 1.0)
+
+        group_row = value_row + 1 + len(flow_rows)
+        group_lb: list[float] = []
+        group_ub: list[float] = []
+
+        def add_row(terms: list[tuple[int, float]], lb: float, ub: float) -> None:
+            row = group_row + len(group_lb)
+            for col, value in terms:
+                add(row, col, value)
+            group_lb.append(lb)
+            group_ub.append(ub)
+
+        for num in range(1, n + 1):
+            for k in range(slots):
+                base = self._groups_start + ((num - 1) * slots + k) * slot_width
+                colours, group_jokers, used, with_jokers = (
+                    range(base, base + cs),
+                    base + cs,
+                    base + cs + 1,
+                    base + cs + 2,
+                )
+                for c, col in enumerate(colours):
+                    add(c * n + num - 1, col, 1.0)
+                    add(value_row, col, num)
+                if joker is not None:
+                    add(tcount - 1, group_jokers, 1.0)
+                    add(value_row, group_jokers, num)
+                size = [(col, 1.0) for col in (*colours, group_jokers)]
+                # a used slot holds between min_len and colours tiles,
+                # including at least one real tile.
+                add_row([*size, (used, -mlen)], 0, np.inf)
+                add_row([*size, (used, -cs)], -np.inf, 0)
+                add_row([*((col, 1.0) for col in colours), (used, -1)], 0, np.inf)
+                # jokers only in groups of the minimal length
+                add_row([(group_jokers, 1.0), (with_jokers, -jokers)], -np.inf, 0)
+                add_row([*size, (with_jokers, cs - mlen)], -np.inf, cs)
+                if k:
+                    # use the slots in order, to avoid symmetric solutions
+                    add_row([(used - slot_width, 1.0), (used, -1.0)], 0, np.inf)
+        if joker is not None:
+            add(tcount - 1, self._jokersets, mlen)
+            add(value_row, self._jokersets, mlen * n)
+
+        nrows = group_row + len(group_lb)
+        self._constraints = sparse.csr_matrix(
+            (data, (rows, cols)), shape=(nrows, nvars)
+        )
+        self._nflows = len(flow_rows)
+        self._group_lb, self._group_ub = np.array(group_lb), np.array(group_ub)
+        self._min_initial_value = ruleset.min_initial_value
+
+        # A given run could appear multiple times, but never more than
+        # *repeats* times, the same applies to tiles, except for jokers. Group
+        # slot variables are binary, except for the joker counts.
+        ub = np.full(nvars, ruleset.repeats, dtype=np.float64)
+        slot_ub = np.ones(slot_width)
+        slot_ub[cs] = jokers
+        ub[self._groups_start : self._jokersets] = np.tile(slot_ub, n * slots)
+        ub[self._jokersets] = min(ruleset.repeats, jokers // mlen)
+        if joker is not None:
+            ub[joker - 1] = jokers
+        self._ub = ub
+        self._integrality = np.ones(nvars)
+
+        # Objectives, negated to turn these into minimization problems.
+        tilecount = np.ones(tcount)
+        numbertiles = tilecount.copy()
+        tilevalue = np.tile(np.arange(1, n + 1, dtype=np.float64), ruleset.colours)
+        if joker is not None:
+            numbertiles[-1] = 0
+            tilevalue = np.append(tilevalue, 0)
+        self._objectives = {
+            mode: np.concatenate([-obj, np.zeros(nvars - tcount)])
+            for mode, obj in (
+                (SolverMode.TILE_COUNT, tilecount),
+                (SolverMode.TOTAL_VALUE, tilevalue),
+                (SolverMode.INITIAL, numbertiles),
+            )
+        }
+
+    def _extend(self, state: RunState, joker: bool) -> Optional[RunState]:
+        """Extend a run with a tile or joker, None if that isn't possible
+
+        Whether or not the last tile is a joker only matters for runs longer
+        than the minimal length, and is otherwise normalized to False.
+
+        """
+        mlen = self._ruleset.min_len
+        length, first_joker, _, has_real = state
+        # runs that start with a joker can't be longer than the minimum
+        if length >= mlen * 2 - 1 or (first_joker and length >= mlen):
+            return None
+        length += 1
+        return (length, first_joker, joker and length > mlen, has_real or not joker)
+
+    def _can_end(self, state: RunState) -> bool:
+        """Can a run with this state be closed off as a valid set"""
+        mlen = self._ruleset.min_len
+        length, first_joker, last_joker, has_real = state
+        if length < mlen or not has_real:
+            return False
+        # Jokers at the start or end of runs longer than the minimal length
+        # would be free for the next player to take.
+        return length == mlen or not (first_joker or last_joker)
+
+    def __call__(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> SolverSolution:
+        """Find a solution for the given game state
+
+        Uses the appropriate objective for the given solver mode, and takes
+        the rack tile count and table tile count from state.
+
+        With a deadline, a time.monotonic() value, HiGHS stops when the time
+        is up and the best solution found so far is used, with its gap. If
+        there is no solution yet, the solution places no tiles and has a gap
+        of inf. The preset sets the MILP gap, node limit and presolve.
+
+        """
+        tcount = self._tcount
+        ub = self._ub.copy()
+        # the selected tiles must all come from your rack
+        ub[:tcount] = np.minimum(ub[:tcount], state.rack_array)
+        if mode is SolverMode.INITIAL:
+            # can't use tiles on the table, set all counts to 0
+            table = np.zeros(tcount)
+            minvalue = self._min_initial_value
+        else:
+            table = state.table_array.astype(np.float64)
+            minvalue = -np.inf
+        flows = np.zeros(self._nflows)
+        row_lb = np.concatenate([table, [minvalue], flows, self._group_lb])
+        row_ub = np.concatenate([table, [np.inf], flows, self._group_ub])
+
+        res = milp(
+            self._objectives[mode],
+            integrality=self._integrality,
+            bounds=Bounds(0, ub),
+            constraints=LinearConstraint(self._constraints, row_lb, row_ub),
+            options=_milp_options(_PRESETS[preset]._replace(deadline=deadline)),
+        )
+        self.stats["solves"] += 1
+        self.stats["nodes"] += getattr(res, "mip_node_count", None) or 0
+        if res.x is None:
+            if res.status == 1:
+                # out of time or nodes before finding a solution
+                return SolverSolution((), (), inf)
+            # no solution for the problem (e.g. no combination of tiles on
+            # the rack leads to a valid set or has enough points when opening)
+            return SolverSolution((), ())
+
+        counts = np.rint(res.x).astype(int)
+        (tidx,) = counts[:tcount].nonzero()
+        tiles = np.repeat(tidx + 1, counts[tidx]).tolist()
+        arc_counts = counts[self._arcs_start : self._groups_start]
+        sets = self._runs(arc_counts)
+        sets += self._groups(counts[self._groups_start : self._jokersets])
+        jokerset = (self._ruleset.joker,) * self._ruleset.min_len
+        sets += [jokerset] * counts[self._jokersets]
+        return SolverSolution(tiles, sorted(sets), _milp_gap(res))
+
+    def _groups(self, slot_counts: np.ndarray) -> list[tuple[int, ...]]:
+        """Recover the groups formed from the group slot variables"""
+        n, cs, joker = self._ruleset.numbers, self._ruleset.colours, self._ruleset.joker
+        slots = slot_counts.reshape(n, self._slots, cs + 3)
+        sets = []
+        for num, numslots in enumerate(slots, 1):
+            for *colours, jokers, used, _ in numslots:
+                if used:
+                    real = [c * n + num for c, count in enumerate(colours) if count]
+                    sets.append((*real, *(joker,) * jokers))
+        return sets
+
+    def _runs(self, arc_counts: np.ndarray) -> list[tuple[int, ...]]:
+        """Recover the runs formed by following the run flows
+
+        Arcs are ordered by colour and number, with the runs ending at a
+        number listed after the runs started and extended, so the partial
+        runs are always available when needed.
+
+        """
+        n, mlen = self._ruleset.numbers, self._ruleset.min_len
+        joker = self._ruleset.joker
+        sets = []
+        # partial runs as lists of tiles, keyed by colour, number and state
+        runs: dict[tuple[int, int, RunState], list[list[int]]] = defaultdict(list)
+        for (c, num, before, action, after), count in zip(self._arcs, arc_counts):
+            for _ in range(count):
+                if action == _END:
+                    run = runs[c, num, before].pop()
+                    sets.append(_run_tuple(run, mlen, joker))
+                    continue
+                run = runs[c, num - 1, before].pop() if before is not None else []
+                tile = c * n + num if action == _TILE else joker
+                runs[c, num, after].append([*run, tile])
+        return sets
+
+
+class JokerSlotSolver:
+    """Solver with joker slot variables instead of joker-substituted sets
+
+    Only sets made up of real tiles (ruleset.base_sets) get a set variable.
+    For each position in a run that a joker could take, an integer variable
+    counts how many copies of the run have a joker in that position instead;
+    the rules that the ruleset sets encode by leaving out sets become
+    constraints: runs longer than the minimal length only have slot variables
+    for their inner positions, and minimal length runs need at least one real
+    tile. Groups of the minimal length with jokers get one variable per
+    combination of real tiles, as it doesn't matter which colours the jokers
+    stand in for, and sets made up of only jokers get a single variable. The
+    model is solved with HiGHS via scipy.optimize.milp.
+
+    As with CompactSolver, only solves for a single move use this model; the
+    ruleset hands everything else to the HiGHS backend.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self.stats: Counter[str] = Counter()
+        n, mlen, joker = ruleset.numbers, ruleset.min_len, ruleset.joker
+        tcount = self._tcount = ruleset.tile_count
+        sets = self._sets = ruleset.base_sets
+
+        # joker slots as (set index, position), and groups of the minimal
+        # length completed by jokers, as tuples of the real tiles.
+        slots: list[tuple[int, int]] = []
+        partial: list[tuple[int, ...]] = []
+        if joker is not None:
+            for i, s in enumerate(sets):
+                if not _is_run(s, n):
+                    continue
+                start = 0 if len(s) == mlen else 1
+                slots += ((i, p) for p in range(start, len(s) - start))
+        if joker is not None and mlen <= ruleset.colours:
+            # groups with jokers still can't be longer than there are colours
+            for num, size in np.ndindex(n, mlen - 1):
+                partial += (
+                    tuple(c * n + num + 1 for c in cs)
+                    for cs in combinations(range(ruleset.colours), size + 1)
+                )
+        self._slots, self._partial = slots, partial
+        self._sets_start = tcount
+        self._slots_start = self._sets_start + len(sets)
+        self._partial_start = self._slots_start + len(slots)
+        self._jokersets = self._partial_start + len(partial)
+        nvars = self._jokersets + 1
+
+        # rows: per tile, tiles used in sets minus tiles placed from the rack
+        # equals the table count, then one row for the initial meld value,
+        # then the rows limiting the joker slots.
+        value_row = tcount
+        rows, cols, data = [], [], []
+
+        def add(row: int, col: int, value: float) -> None:
+            rows.append(row)
+            cols.append(col)
+            data.append(value)
+
+        for t in range(tcount):
+            add(t, t, -1.0)
+        for i, s in enumerate(sets, self._sets_start):
+            for t in s:
+                add(t - 1, i, 1.0)
+            add(value_row, i, sum((t - 1) % n + 1 for t in s))
+
+        slot_row = value_row + 1
+        minimal = {
+            i: r
+            for r, i in enumerate(sorted({i for i, p in slots if len(sets[i]) == mlen}))
+        }
+        limit_row = slot_row + len(slots)
+        for k, (i, p) in enumerate(slots):
+            col = self._slots_start + k
+            # the joker takes the place of a tile
+            add(sets[i][p] - 1, col, -1.0)
+            add(tcount - 1, col, 1.0)
+            # no more jokers in a position than there are copies of the run
+            add(slot_row + k, col, 1.0)
+            add(slot_row + k, self._sets_start + i, -1.0)
+            if i in minimal:
+                add(limit_row + minimal[i], col, 1.0)
+        # minimal length runs need at least one real tile
+        for i, r in minimal.items():
+            add(limit_row + r, self._sets_start + i, 1.0 - mlen)
+        for i, tiles in enumerate(partial, self._partial_start):
+            for t in tiles:
+                add(t - 1, i, 1.0)
+            add(tcount - 1, i, mlen - len(tiles))
+            add(value_row, i, mlen * ((tiles[0] - 1) % n + 1))
+        if joker is not None:
+            add(tcount - 1, self._jokersets, mlen)
+            add(value_row, self._jokersets, mlen * n)
+        self._nlimits = len(slots) + len(minimal)
+
+        self._constraints = sparse.csr_matrix(
+            (data, (rows, cols)), shape=(slot_row + self._nlimits, nvars)
+        )
+        self._min_initial_value = ruleset.min_initial_value
+
+        # A given set could appear multiple times, but never more than
+        # *repeats* times, the same applies to tiles, except for jokers.
+        ub = np.full(nvars, ruleset.repeats, dtype=np.float64)
+        ub[self._jokersets] = min(ruleset.repeats, ruleset.jokers // mlen)
+        if joker is not None:
+            ub[joker - 1] = ruleset.jokers
+        self._ub = ub
+        self._integrality = np.ones(nvars)
+
+        # Tile counts per set for presolve, for all tiles and for the tiles
+        # that can't be replaced by a joker, and jokers per partial group.
+        columns = self._constraints[:tcount].toarray()
+        self._base = columns[:, self._sets_start : self._slots_start]
+        self._fixed = self._base.copy()
+        for i, p in slots:
+            self._fixed[sets[i][p] - 1, i] = 0
+        self._partial_tiles = columns[:, self._partial_start : self._jokersets]
+        self._partial_jokers = np.array([mlen - len(t) for t in partial], dtype=int)
+        if joker is not None:
+            self._base[joker - 1] = self._partial_tiles[joker - 1] = 0
+
+        # Objectives, negated to turn these into minimization problems.
+        tilecount = np.ones(tcount)
+        numbertiles = tilecount.copy()
+        tilevalue = np.tile(np.arange(1, n + 1, dtype=np.float64), ruleset.colours)
+        if joker is not None:
+            numbertiles[-1] = 0
+            tilevalue = np.append(tilevalue, 0)
+        self._objectives = {
+            mode: np.concatenate([-obj, np.zeros(nvars - tcount)])
+            for mode, obj in (
+                (SolverMode.TILE_COUNT, tilecount),
+                (SolverMode.TOTAL_VALUE, tilevalue),
+                (SolverMode.INITIAL, numbertiles),
+            )
+        }
+
+    def _set_bounds(self, mode: SolverMode, state: GameState) -> np.ndarray:
+        """Upper bounds for the set, slot and partial group variables
+
+        Tiles that can't be replaced by a joker limit how often a set can be
+        formed, the other tiles limit this together with the jokers.
+
+        """
+        available = state.rack_array
+        if mode is not SolverMode.INITIAL:
+            available = available + state.table_array
+        jokers = available[-1] if self._ruleset.joker is not None else 0
+        repeats = self._ruleset.repeats
+
+        def bounds(matrix: np.ndarray, counts: np.ndarray) -> np.ndarray:
+            copies = np.where(matrix, counts[:, None] // np.maximum(matrix, 1), repeats)
+            return copies.min(axis=0, initial=repeats)
+
+        sets = np.minimum(
+            bounds(self._fixed, available), bounds(self._base, available + jokers)
+        )
+        slots = sets[[i for i, _ in self._slots]]
+        partial = np.minimum(
+            bounds(self._partial_tiles, available), jokers // self._partial_jokers
+        )
+        return np.concatenate([sets, slots, partial])
+
+    def __call__(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> SolverSolution:
+        """Find a solution for the given game state
+
+        Uses the appropriate objective for the given solver mode, and takes
+        the rack tile count and table tile count from state.
+
+        With a deadline, a time.monotonic() value, HiGHS stops when the time
+        is up and the best solution found so far is used, with its gap. If
+        there is no solution yet, the solution places no tiles and has a gap
+        of inf. The preset sets the MILP gap, node limit and presolve.
+
+        """
+        tcount = self._tcount
+        ub = self._ub.copy()
+        # the selected tiles must all come from your rack
+        ub[:tcount] = np.minimum(ub[:tcount], state.rack_array)
+        if self._ruleset.presolve:
+            bounds = self._set_bounds(mode, state)
+            ub[self._sets_start : self._jokersets] = bounds
+            self.stats["sets"] += bounds.size
+            self.stats["sets_fixed"] += int(np.count_nonzero(bounds == 0))
+        if mode is SolverMode.INITIAL:
+            # can't use tiles on the table, set all counts to 0
+            table = np.zeros(tcount)
+            minvalue = self._min_initial_value
+        else:
+            table = state.table_array.astype(np.float64)
+            minvalue = -np.inf
+        limits = np.zeros(self._nlimits)
+        row_lb = np.concatenate([table, [minvalue], np.full_like(limits, -np.inf)])
+        row_ub = np.concatenate([table, [np.inf], limits])
+
+        res = milp(
+            self._objectives[mode],
+            integrality=self._integrality,
+            bounds=Bounds(0, ub),
+            constraints=LinearConstraint(self._constraints, row_lb, row_ub),
+            options=_milp_options(_PRESETS[preset]._replace(deadline=deadline)),
+        )
+        self.stats["solves"] += 1
+        self.stats["nodes"] += getattr(res, "mip_node_count", None) or 0
+        if res.x is None:
+            if res.status == 1:
+                # out of time or nodes before finding a solution
+                return SolverSolution((), (), inf)
+            # no solution for the problem (e.g. no combination of tiles on
+            # the rack leads to a valid set or has enough points when opening)
+            return SolverSolution((), ())
+
+        counts = np.rint(res.x).astype(int)
+        (tidx,) = counts[:tcount].nonzero()
+        tiles = np.repeat(tidx + 1, counts[tidx]).tolist()
+        sets = self._joker_sets(
+            counts[self._sets_start : self._slots_start],
+            counts[self._slots_start : self._partial_start],
+        )
+        mlen, joker = self._ruleset.min_len, self._ruleset.joker
+        partial = counts[self._partial_start : self._jokersets]
+        for i in partial.nonzero()[0]:
+            reals = self._partial[i]
+            sets += [(*reals, *(joker,) * (mlen - len(reals)))] * partial[i]
+        sets += [(joker,) * mlen] * counts[self._jokersets]
+        return SolverSolution(tiles, sorted(sets), _milp_gap(res))
+
+    def _joker_sets(
+        self, set_counts: np.ndarray, slot_counts: np.ndarray
+    ) -> list[tuple[int, ...]]:
+        """Produce the sets formed, with jokers in their slots
+
+        Jokers in a given position are spread over the copies of a run in
+        turn, which keeps the number of jokers per copy within the limits.
+
+        """
+        rs = self._ruleset
+        n, mlen, joker = rs.numbers, rs.min_len, rs.joker
+        copies = {
+            i: [list(self._sets[i]) for _ in range(count)]
+            for i, count in enumerate(set_counts)
+            if count
+        }
+        turn: Counter[int] = Counter()
+        for (i, p), count in zip(self._slots, slot_counts):
+            for _ in range(count):
+                copies[i][turn[i] % len(copies[i])][p] = joker
+                turn[i] += 1
+        return [
+            (
+                _run_tuple(tiles, mlen, joker)
+                if _is_run(self._sets[i], n)
+                else tuple(tiles)
+            )
+            for i, setcopies in copies.items()
+            for tiles in setcopies
+        ]
@@ -6,18 +6,21 @@ import shutil
 from cmd import Cmd
 from collections import Counter
 from enum import Enum
-from itertools import chain, islice
+from itertools import chain, cycle, islice
+from multiprocessing.pool import AsyncResult
 from pathlib import Path
 from textwrap import dedent
-from typing import Callable, Iterable, cast, Any, Sequence, TYPE_CHECKING
+from time import monotonic
+from typing import Callable, Iterable, cast, Any, Optional, Sequence, TYPE_CHECKING
 
 import click
 from appdirs import user_data_dir
 
 from . import __project__, __author__, __version__
+from .background import BackgroundSolver
 from .ruleset import RuleSet
 from .gamestate import GameState
-from .types import Colours, SolverMode, expand_tileref
+from .types import Colours, ProposedSolution, SolverBackend, SolverMode, expand_tileref
 
 try:
     import readline
@@ -29,11 +32,32 @@ except ImportError:
 
 if TYPE_CHECKING:
     CompleterMethod = Callable[[Any, str, str, int, int], Sequence[str]]
+    # solver mode, initial flag, table and rack tiles
+    SolveKey = tuple[SolverMode, bool, tuple[int, ...], tuple[int, ...]]
 
 
 SAVEPATH = Path(user_data_dir(__project__, __author__))
 
 
+def calibrated_backend(ruleset: RuleSet) -> SolverBackend:
+    """The fastest solver backend for the ruleset
+
+    The backends are timed the first time a ruleset is used, and the result is
+    stored next to the saved games.
+
+    """
+    path = SAVEPATH / f"solver_{ruleset.game_state_key}"
+    try:
+        return SolverBackend(path.read_text().strip())
+    except (OSError, ValueError):
+        pass
+    click.echo("Picking the fastest solver for these rules, this only happens once.")
+    backend = ruleset.calibrate()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(backend.value)
+    return backend
+
+
 JOKER = Colours.joker.value
 BASE_PROMPT = "(rsconsole) "
 CURRENT = "__current_game__"
@@ -44,6 +68,11 @@ GAME_CLOSED = N1 + click.style(N2 + "\N{BALLOT BOX WITH X}" + N1, fg="bright_red
 GAME_OPEN = (
     N1 + click.style(N2 + "\N{BALLOT BOX WITH CHECK}" + N1, fg="bright_green") + N2
 )
+SPINNER = "|/-\\"
+
+
+class SolveCancelled(Exception):
+    """The user cancelled a solve running in the background"""
 
 
 class TileSource(Enum):
@@ -150,6 +179,24 @@ def _fixed_completer(*options: str, case_insensitive: bool = False) -> Completer
     return completer
 
 
+def _parse_duration(text: str) -> Optional[float]:
+    """Parse a duration like 500ms, 2s or 1.5 (seconds) into seconds
+
+    Returns None if the text is not a valid duration.
+
+    """
+    scale = 1.0
+    if text.endswith("ms"):
+        text, scale = text[:-2], 0.001
+    elif text.endswith("s"):
+        text = text[:-1]
+    try:
+        seconds = float(text) * scale
+    except ValueError:
+        return None
+    return seconds if 0 < seconds < float("inf") else None
+
+
 def _tile_display(tiles: Iterable[str]) -> str:
     """Format a sequence of tiles into columns
 
@@ -183,6 +230,10 @@ class SolverConsole(Cmd):
         self._shelve_path = SAVEPATH / f"games_{ruleset.game_state_key}"
         self._tile_map, self._r_tile_map = ruleset.create_tile_maps()
         self._ruleset = ruleset
+        self._background = BackgroundSolver(ruleset)
+        # speculative solve of the current game, started after each change
+        self._speculation: Optional[tuple[SolveKey, AsyncResult]] = None
+        self._speculated: Optional[SolveKey] = None
 
     if not has_readline:
         if not TYPE_CHECKING:
@@ -268,8 +319,100 @@ class SolverConsole(Cmd):
     def postcmd(self, stop: bool, line: str) -> bool:
         if self._shelve is not None:
             self._shelve.close() if stop else self._shelve.sync()
+        if stop:
+            self._background.close()
+        elif self._shelve is not None:
+            self._speculate()
         return stop
 
+    def _solve_key(self, mode: Optional[SolverMode] = None) -> SolveKey:
+        """Identify the solve for the current game, with the given mode"""
+        game = self.game
+        if mode is None:
+            mode = SolverMode.INITIAL if game.initial else SolverMode.TILE_COUNT
+        return mode, game.initial, tuple(game.sorted_table), tuple(game.sorted_rack)
+
+    def _speculate(self) -> None:
+        """Start solving the current game in the background
+
+        The solve command almost always follows a change to the game, so the
+        default solve is started as soon as the game changes. A speculative
+        solve still running for an older state is cancelled.
+
+        """
+        key = self._solve_key()
+        if key == self._speculated:
+            return
+        self._drop_speculation()
+        self._speculated = key
+        if self.game.rack:
+            self._speculation = key, self._background.submit("solve", self.game)
+
+    def _drop_speculation(self) -> None:
+        """Forget the speculative solve, cancelling it if still running"""
+        if self._speculation is not None:
+            if not self._speculation[1].ready():
+                self._background.cancel()
+            self._speculation = None
+
+    def _in_background(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Call a ruleset method in a worker process, showing a spinner
+
+        Ctrl-C cancels the call and raises SolveCancelled, leaving the console
+        running.
+
+        """
+        # don't wait for a speculative solve the user has no need for
+        self._drop_speculation()
+        return self._wait(self._background.submit(method, *args, **kwargs))
+
+    def _wait(
+        self,
+        pending: AsyncResult,
+        preview: bool = False,
+        mode: Optional[SolverMode] = None,
+    ) -> Any:
+        """Wait for a background call to complete, see _in_background()
+
+        With preview set, a quick answer for the solver mode is shown while
+        waiting for a solve, see _preview().
+
+        """
+        interactive, start = self.stdout.isatty(), monotonic()
+        frames = cycle(SPINNER)
+        rows = 0
+        try:
+            if preview:
+                rows = self._preview(pending, mode)
+            while not pending.ready():
+                pending.wait(0.1)
+                if interactive and not pending.ready():
+                    elapsed = monotonic() - start
+                    self.stdout.write(
+                        f"\r{next(frames)} Solving... {elapsed:.1f}s "
+                        "(Ctrl-C to cancel)"
+                    )
+                    self.stdout.flush()
+        except KeyboardInterrupt:
+            self._background.cancel()
+            raise SolveCancelled from None
+        finally:
+            if interactive:
+                # clear the spinner line
+                self.stdout.write("\r\x1b[K")
+                self.stdout.flush()
+        if rows:
+            # replace the quick answer with the solver result
+            self.stdout.write(f"\x1b[{rows}F\x1b[J")
+        return self._background.result(pending)
+
+    def onecmd(self, line: str) -> bool:
+        try:
+            return super().onecmd(line)
+        except SolveCancelled:
+            self.message(click.style("Solve cancelled", fg="yellow"))
+            return False
+
     @property
     def game(self) -> GameState:
         return self._games[self._current_game]
@@ -585,7 +728,7 @@ class SolverConsole(Cmd):
     complete_remove = TileSource.TABLE.tile_completer
 
     def do_solve(self, arg: str = "") -> None:
-        """solve [tiles | value | initial]
+        """solve [tiles | value | initial] [count] [--within TIME] | solve pareto
         Attempt to place tiles.
 
         You can either maximize for number of tiles placed, the maximum value
@@ -595,37 +738,160 @@ class SolverConsole(Cmd):
         the default action is to solve for initial placement, otherwise the
         default is to maximise the number of tiles placed.
 
+        Give a count to page through that many alternative solutions, best
+        first, each using a different selection of tiles from your rack.
+
+        Use "solve pareto" to list the best trade-offs between the number of
+        tiles placed and their value.
+
+        Use --within to limit how long the solver can take, e.g. "--within
+        500ms" or "--within 2s". When the time is up, the best solution found
+        so far is shown, together with how far from optimal it could be.
+
+        Solving happens in the background; press Ctrl-C to cancel a solve that
+        takes too long.
+
         """
-        if arg not in {"", "tiles", "value", "initial"}:
+        if arg.strip() == "pareto":
+            self._solve_pareto()
+            return
+        args = arg.split()
+        deadline = None
+        if "--within" in args:
+            idx = args.index("--within")
+            del args[idx]
+            deadline = _parse_duration(args.pop(idx)) if idx < len(args) else None
+            if deadline is None:
+                self.error("Not a valid time limit:", arg)
+                return
+        count = int(args.pop()) if args and args[-1].isdigit() else None
+        if (
+            len(args) > 1
+            or not set(args) <= {"tiles", "value", "initial"}
+            or count == 0
+        ):
             self.error("Not a valid argument:", arg)
             return
-        mode = None if not arg else SolverMode(arg)
+        mode = SolverMode(args[0]) if args else None
 
         game = self.game
-        sol = self._ruleset.solve(game, mode)
-        if sol is None:
+        if count is None:
+            key, speculation = self._solve_key(mode), self._speculation
+            if deadline is None and speculation and speculation[0] == key:
+                # the solve was already started when the game last changed
+                self._speculation = None
+                pending = speculation[1]
+            else:
+                self._drop_speculation()
+                pending = self._background.submit(
+                    "solve", game, mode, deadline=deadline
+                )
+            sol = self._wait(pending, preview=True, mode=mode)
+            solutions = [] if sol is None else [sol]
+        else:
+            solutions = self._in_background(
+                "solve", game, mode, k=count, deadline=deadline
+            )
+        if solutions and not solutions[0].tiles:
+            # ran out of time before finding anything
+            self.message("No solution found in time - pick up a tile.")
+            return
+        if not solutions:
             self.message("No solution found - pick up a tile.")
             return
 
-        self.message("Using the following tiles from your rack:")
-        self.message(_tile_display(self._r_tile_map[t] for t in sol.tiles))
-        self.message("Make the following sets:")
-        for s in sol.sets:
-            self.message(" ", ", ".join([Colours.c(self._r_tile_map[t]) for t in s]))
+        for i, sol in enumerate(solutions, 1):
+            if len(solutions) > 1:
+                header = f"Solution {i} of {len(solutions)}"
+                self.message(click.style(header, bold=True))
+            self.message("\n".join(self._solution_lines(sol)))
+            if sol.gap:
+                gap = "unknown" if sol.gap == float("inf") else f"{sol.gap:.1%}"
+                self.message(
+                    click.style(
+                        f"This may not be the best solution (optimality gap: "
+                        f"{gap})",
+                        fg="yellow",
+                    )
+                )
 
-        if self.confirm(
-            "Automatically place tiles for selected solution?", default=True
-        ):
-            game.remove_rack(sol.tiles)
-            game.add_table(sol.tiles)
-            if game.initial:
-                game.initial = False
-                self._update_prompt()
+            if self.confirm(
+                "Automatically place tiles for selected solution?",
+                default=i == 1,
+            ):
+                game.remove_rack(sol.tiles)
+                game.add_table(sol.tiles)
+                if game.initial:
+                    game.initial = False
+                    self._update_prompt()
+
+                self.message("Placed tiles on table")
+                return
+            if i < len(solutions) and not self.confirm(
+                "Show the next solution?", default=True
+            ):
+                return
+
+    def _solution_lines(self, sol: ProposedSolution) -> list[str]:
+        """The tiles to place and the sets to make for a solution"""
+        return [
+            "Using the following tiles from your rack:",
+            _tile_display(self._r_tile_map[t] for t in sol.tiles),
+            "Make the following sets:",
+            *(
+                "  " + ", ".join([Colours.c(self._r_tile_map[t]) for t in s])
+                for s in sol.sets
+            ),
+        ]
 
-            self.message("Placed tiles on table")
+    def _preview(self, pending: AsyncResult, mode: Optional[SolverMode]) -> int:
+        """Show a quick answer while waiting for a slow solve
+
+        The greedy heuristic answer is only shown on a terminal, when the
+        solve takes noticeably long and the answer fits on the screen.
+        Returns the number of terminal rows written, so the answer can be
+        replaced by the solver result.
+
+        """
+        if not self.stdout.isatty():
+            return 0
+        pending.wait(0.1)
+        if pending.ready():
+            return 0
+        sol = self._ruleset.quick_solve(self.game, mode)
+        if sol is None:
+            return 0
+        header = "Quick answer, while looking for the best solution:"
+        lines = [click.style(header, fg="yellow"), *self._solution_lines(sol)]
+        width, height = shutil.get_terminal_size()
+        rows = sum(
+            max(1, -(-len(click.unstyle(line)) // width))
+            for text in lines
+            for line in text.splitlines()
+        )
+        if rows >= height - 1:
+            # rows that scrolled off the screen can't be replaced
+            return 0
+        self.message("\n".join(lines))
+        return rows
+
+    def _solve_pareto(self) -> None:
+        front = self._in_background("pareto", self.game)
+        if not front:
+            self.message("No solution found - pick up a tile.")
+            return
+        n, joker = self._ruleset.numbers, self._ruleset.joker
+        lines = [click.style(" # Tiles Value  Rack tiles", bold=True)]
+        for i, sol in enumerate(front, 1):
+            value = sum((t - 1) % n + 1 for t in sol.tiles if t != joker)
+            tiles = ", ".join([Colours.c(self._r_tile_map[t]) for t in sol.tiles])
+            lines.append(f"{i:2} {len(sol.tiles):5} {value:5}  {tiles}")
+        self.message("\n".join(lines), perhaps_paged=True)
 
     emptyline = do_solve
-    complete_solve = _fixed_completer("tiles", "value", "initial")
+    complete_solve = _fixed_completer(
+        "tiles", "value", "initial", "pareto", "--within"
+    )
 
     def do_check(self, arg: str) -> None:
         """check
@@ -637,7 +903,7 @@ class SolverConsole(Cmd):
         table.
 
         """
-        arr = self._ruleset.arrange_table(self.game)
+        arr = self._in_background("arrange_table", self.game)
         if not arr:
             self.message(
                 click.style(
@@ -654,6 +920,33 @@ class SolverConsole(Cmd):
             jokers = ", ".join([Colours.c(JOKER)] * arr.free_jokers)
             self.message(click.style(f"Free jokers: {jokers}", fg="bright_green"))
 
+    def do_export(self, arg: str) -> None:
+        """export path [tiles | value | initial]
+        Write the solver problem for the current game to a file
+
+        The problem is written in MPS format to a path ending in .mps, or in
+        CPLEX LP format to a path ending in .lp. The mode defaults to the same
+        mode the solve command uses.
+
+        Run "rsconsole replay-problems" on a directory of exported problems
+        to solve these again and time the solves, with any solver backend.
+
+        """
+        args = arg.split()
+        mode = None
+        if len(args) > 1 and args[-1] in {"tiles", "value", "initial"}:
+            mode = SolverMode(args.pop())
+        if not args:
+            self.error("You must provide a path to export to")
+            return
+        path = Path(" ".join(args)).expanduser()
+        try:
+            self._ruleset.export(self.game, path, mode)
+        except (OSError, ValueError) as exc:
+            self.error(exc)
+            return
+        self.message(f"Problem written to {path}")
+
     def do_stop(self, arg: str) -> bool:
         """stop | end | quit
         Exit from the console
@@ -665,11 +958,23 @@ class SolverConsole(Cmd):
     do_quit = do_stop
     do_EOF = do_stop
 
+    def do_stats(self, arg: str) -> None:
+        """stats
+        Show the solver statistics for this session
+        """
+        stats = self._ruleset.stats
+        self.message(f"Solver: {self._ruleset.backend.value}")
+        if not stats:
+            self.message("No solver statistics collected yet")
+        for name, value in sorted(stats.items()):
+            self.message(f"{name.replace('_', ' ').capitalize()}: {value}")
+
     def do_version(self, arg: str) -> None:
         """version
         Print the version number
         """
         self.message(f"{__project__} version {__version__}")
+        self.message(f"Using the {self._ruleset.backend.value} solver")
 
     def help_about(self) -> None:
         help_text = dedent(
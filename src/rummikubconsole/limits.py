@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+from math import inf
+from time import monotonic
+from typing import Any, NamedTuple, Optional
+
+from scipy.optimize import OptimizeResult
+
+from .types import SolverPreset
+
+
+class _Limits(NamedTuple):
+    """How far a MILP solve goes to prove optimality"""
+
+    # relative gap between the solution and the bound on the optimum to stop at
+    gap: float = 0.0
+    # maximum number of branch-and-bound nodes, None for no limit
+    nodes: Optional[int] = None
+    # use the MILP solver presolve; it costs more than it saves on small models
+    presolve: bool = True
+    # time.monotonic() value to stop at, with the best solution found so far
+    deadline: Optional[float] = None
+
+    def expired(self) -> bool:
+        """Has the deadline passed"""
+        return self.deadline is not None and monotonic() >= self.deadline
+
+
+_PRESETS = {
+    SolverPreset.EXACT: _Limits(),
+    SolverPreset.BALANCED: _Limits(gap=0.001, nodes=1000),
+    SolverPreset.FAST: _Limits(gap=0.01, nodes=100, presolve=False),
+}
+_EXACT = _PRESETS[SolverPreset.EXACT]
+
+
+def _milp_options(limits: _Limits) -> dict[str, Any]:
+    """scipy.optimize.milp options for the limits"""
+    options: dict[str, Any] = {"mip_rel_gap": limits.gap, "presolve": limits.presolve}
+    if limits.nodes is not None:
+        options["node_limit"] = limits.nodes
+    if limits.deadline is not None:
+        options["time_limit"] = max(limits.deadline - monotonic(), 0.0)
+    return options
+
+
+def _milp_gap(res: OptimizeResult) -> float:
+    """The relative optimality gap of a scipy.optimize.milp solution
+
+    Solves cut short by a limit can have found a solution without a bound on
+    the optimum, the gap is inf then.
+
+    """
+    gap = getattr(res, "mip_gap", None)
+    return inf if gap is None else max(gap, 0.0)
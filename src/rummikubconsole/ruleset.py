@@ -1,13 +1,56 @@
 # SPDX-License-Identifier: MIT
 from __future__ import annotations
 
-from functools import cached_property
+import json
+import random
+import threading
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import cached_property, partial
 from itertools import chain, combinations, islice, product, repeat
-from typing import Callable, Iterable, Optional, Sequence, Sized
+from math import inf
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Any, Iterable, Iterator, Optional, Sequence, Union, overload
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
 
 from .gamestate import GameState
-from .solver import RummikubSolver
-from .types import Colours, ProposedSolution, SolverMode, TableArrangement
+from .solver import SOLVERS, HighsSolver, _available, _set_bounds, _set_matrix
+from .solverpool import SolverPool
+from .types import (
+    Colours,
+    ProposedSolution,
+    SolverBackend,
+    SolverMode,
+    SolverPreset,
+    SolverSolution,
+    TableArrangement,
+)
+
+
+# marks the first line of an exported problem file, followed by the rules,
+# solver mode and game state as JSON
+_PROBLEM_HEADER = "rummikubconsole problem"
+# comment prefix for the first line, per exported problem file format
+_PROBLEM_COMMENTS = {".mps": "*", ".lp": "\\"}
+
+
+# ruleset used to solve game state components in worker processes
+_worker_ruleset: Optional[RuleSet] = None
+
+
+def _init_worker(kwargs: dict[str, Any]) -> None:
+    global _worker_ruleset
+    _worker_ruleset = RuleSet(**kwargs)
+
+
+def _solve_in_worker(mode: SolverMode, state: GameState) -> SolverSolution:
+    assert _worker_ruleset is not None
+    return _worker_ruleset._solver(mode, state)
 
 
 class RuleSet:
@@ -21,6 +64,13 @@ class RuleSet:
         jokers: int = 2,
         min_len: int = 3,
         min_initial_value: int = 30,
+        backend: SolverBackend = SolverBackend.GLPK,
+        cache_dir: Optional[Path] = None,
+        presolve: bool = True,
+        decompose: bool = False,
+        processes: Optional[int] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+        pool_size: int = 1,
     ):
         self.numbers = numbers
         self.repeats = repeats
@@ -28,6 +78,28 @@ class RuleSet:
         self.jokers = jokers
         self.min_len = min_len
         self.min_initial_value = min_initial_value
+        # where solvers can cache data between sessions
+        self.cache_dir = cache_dir
+        # only give solvers the sets that can be formed from available tiles
+        self.presolve = presolve
+        # solve independent parts of a game state separately, using this
+        # number of worker processes or None to solve everything in this
+        # process.
+        self.decompose = decompose
+        self.processes = processes
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        # default solve quality preset, see solve()
+        self.preset = preset
+        # number of solver instances per backend, so that this many threads
+        # can solve at the same time. The GLPK backend still solves one
+        # problem at a time, see SolverPool.
+        self.pool_size = pool_size
+        # statistics of all solvers, see stats
+        self._stats: Counter[str] = Counter()
+        self._highs_pool = SolverPool(
+            partial(HighsSolver, self), pool_size, self._stats
+        )
 
         self.tile_count = numbers * colours
         self.joker = None
@@ -35,68 +107,431 @@ class RuleSet:
             self.tile_count += 1
             self.joker = self.tile_count
 
-        self._solver = RummikubSolver(self)
+        self.backend = backend
+
+    @property
+    def backend(self) -> SolverBackend:
+        """The solver backend used to solve game states"""
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: SolverBackend) -> None:
+        if backend is not getattr(self, "_backend", None):
+            self._backend = backend
+            self._stats.clear()
+            self._pool = SolverPool(
+                partial(SOLVERS[backend], self), self.pool_size, self._stats
+            )
+            self._solver = self._pool.first
+
+    def _solve(self, mode: SolverMode, state: GameState) -> SolverSolution:
+        """Solve a game state, one independent component at a time
+
+        Tiles that can never be part of the same set form independent
+        problems; these are solved separately and the solutions combined.
+
+        """
+        if not self.decompose:
+            with self._checkout() as solver:
+                return solver(mode, state)
+        components = self._components(mode, state)
+        if len(components) == 1:
+            with self._checkout() as solver:
+                return solver(mode, state)
+
+        if self.processes is None:
+            with self._checkout() as solver:
+                solutions = [solver(mode, comp) for comp in components]
+        else:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        self.processes,
+                        initializer=_init_worker,
+                        initargs=(self._worker_kwargs(),),
+                    )
+            modes = [mode] * len(components)
+            solutions = list(self._executor.map(_solve_in_worker, modes, components))
+
+        tiles, sets = [], []
+        for comp, sol in zip(components, solutions):
+            if comp.table and not sol.sets:
+                # the tiles on the table in this component can't be arranged
+                # into sets, so there is no solution for the whole state.
+                return SolverSolution((), ())
+            tiles += sol.tiles
+            sets += sol.sets
+        return SolverSolution(sorted(tiles), sorted(sets))
+
+    def _components(self, mode: SolverMode, state: GameState) -> list[GameState]:
+        """Split a game state into independent components
+
+        Tiles are connected when they can be part of the same set. Jokers fit
+        into any set, and the initial meld value applies to all sets placed,
+        so with jokers in play or in initial mode the state is not split.
+
+        """
+        available = _available(mode, state)
+        if mode is SolverMode.INITIAL or (
+            self.joker is not None and available[self.joker - 1]
+        ):
+            return [state]
+
+        possible = _set_bounds(self._set_matrix, available, self.repeats) > 0
+        smatrix = self._set_matrix[:, possible]
+        connected = sparse.csr_matrix(smatrix, dtype=np.int32)
+        _, labels = connected_components(connected @ connected.T, directed=False)
+        # rack tiles that are not part of any possible set can be ignored
+        (tidx,) = (state.table_array | smatrix.any(axis=1)).nonzero()
+        components = {labels[t] for t in tidx if available[t]}
+        if len(components) <= 1:
+            return [state]
+
+        return [
+            GameState(
+                self.tile_count,
+                [t for t in state.table.elements() if labels[t - 1] == c],
+                [t for t in state.rack.elements() if labels[t - 1] == c],
+            )
+            for c in sorted(components)
+        ]
+
+    @cached_property
+    def _set_matrix(self) -> np.ndarray:
+        return _set_matrix(self)
+
+    def _worker_kwargs(self) -> dict[str, Any]:
+        """Arguments to recreate this ruleset in a worker process"""
+        return {
+            "numbers": self.numbers,
+            "repeats": self.repeats,
+            "colours": self.colours,
+            "jokers": self.jokers,
+            "min_len": self.min_len,
+            "min_initial_value": self.min_initial_value,
+            "backend": self.backend,
+            "cache_dir": self.cache_dir,
+            "presolve": self.presolve,
+            "decompose": False,
+            "preset": self.preset,
+        }
+
+    @property
+    def stats(self) -> Counter[str]:
+        """Statistics collected by the current solver backend
+
+        Includes the HiGHS solves for problem variants the backend doesn't
+        support itself.
+
+        """
+        return self._stats
 
     def new_game(self) -> GameState:
         """Create a new game state for this ruleset"""
         return GameState(self.tile_count)
 
+    @overload
     def solve(
-        self, state: GameState, mode: Optional[SolverMode] = None
+        self,
+        state: GameState,
+        mode: Optional[SolverMode] = None,
+        *,
+        deadline: Optional[float] = None,
+        preset: Optional[SolverPreset] = None,
     ) -> Optional[ProposedSolution]:
+        ...
+
+    @overload
+    def solve(
+        self,
+        state: GameState,
+        mode: Optional[SolverMode] = None,
+        *,
+        k: int,
+        deadline: Optional[float] = None,
+        preset: Optional[SolverPreset] = None,
+    ) -> list[ProposedSolution]:
+        ...
+
+    def solve(
+        self,
+        state: GameState,
+        mode: Optional[SolverMode] = None,
+        *,
+        k: Optional[int] = None,
+        deadline: Optional[float] = None,
+        preset: Optional[SolverPreset] = None,
+    ) -> Union[Optional[ProposedSolution], list[ProposedSolution]]:
         """Find the best option for placing tiles from the rack
 
         If no mode is selected, uses the game initial state flag
         to switch between initial and tile-count modes.
 
-        When in initial mode, if there are tiles on the table already,
-        adds an extra round of solving if the minimal point threshold has
-        been met, to find additional tiles that can be moved onto the
-        table in the same turn.
+        When in initial mode, if there are tiles on the table already, the
+        initial meld and any further tiles that can be moved onto the table
+        in the same turn are found in a single solve.
 
         Returns None if you can't move tiles from the rack to the table.
 
+        With k set, returns a list of up to k solutions instead, each placing
+        a different selection of tiles from the rack, best first. The list is
+        empty if you can't move tiles from the rack to the table.
+
+        With a deadline, in seconds, the solver stops when the time is up and
+        returns the best solution found so far; its gap attribute gives the
+        proven optimality gap. If no solution was found in time, the solution
+        places no tiles and has a gap of inf. With k set, only the solutions
+        found before the deadline are returned.
+
+        The preset (by default the ruleset preset) trades optimality for
+        speed: with SolverPreset.BALANCED or SolverPreset.FAST the solver
+        stops at a small optimality gap or node limit, and may skip the MILP
+        presolve step. The gap attribute again gives how far from optimal
+        the solution may be.
+
         """
         if mode is None:
             mode = SolverMode.INITIAL if state.initial else SolverMode.TILE_COUNT
+        if deadline is not None:
+            deadline += monotonic()
+        preset = preset or self.preset
+
+        opening = mode is SolverMode.INITIAL and bool(state.table)
+        if k is not None:
+            if opening:
+                solutions = self._opening(state, k, deadline, preset)
+            else:
+                solutions = self._solutions(mode, state, k, deadline, preset)
+            return [
+                ProposedSolution(s.tiles, s.sets, s.gap) for s in solutions if s.tiles
+            ]
+
+        if opening:
+            sol = next(
+                iter(self._opening(state, 1, deadline, preset)), SolverSolution((), ())
+            )
+        elif deadline is not None or preset is not SolverPreset.EXACT:
+            # the components of a decomposed state can't share a deadline or
+            # an optimality gap
+            with self._checkout() as solver:
+                sol = solver(mode, state, deadline, preset)
+        else:
+            sol = self._solve(mode, state)
+        if not sol.tiles and sol.gap < inf:
+            return None
+        return ProposedSolution(sol.tiles, sol.sets, sol.gap)
+
+    def quick_solve(
+        self, state: GameState, mode: Optional[SolverMode] = None
+    ) -> Optional[ProposedSolution]:
+        """Quickly find a reasonable, but not necessarily best, option
+
+        Uses a greedy heuristic that takes a fraction of the time a solve
+        takes, to have an answer to show while solve() finds the best one.
+        Selects the mode like solve() does. When opening, only the initial
+        meld is placed. The gap is always inf, there is no telling how far
+        from optimal the solution is.
+
+        Returns None if the heuristic finds no tiles to move from the rack.
 
-        sol = self._solver(mode, state)
+        """
+        if mode is None:
+            mode = SolverMode.INITIAL if state.initial else SolverMode.TILE_COUNT
+        with self._checkout("greedy") as solver:
+            sol = solver.greedy(mode, state)
         if not sol.tiles:
             return None
+        return ProposedSolution(sol.tiles, sol.sets, sol.gap)
 
-        tiles = sol.tiles
-        set_indices = sol.set_indices
+    def export(
+        self, state: GameState, path: Path, mode: Optional[SolverMode] = None
+    ) -> None:
+        """Write the problem solved for a game state to a file
 
-        if mode is SolverMode.INITIAL and state.table:
-            # placed initial tiles, can now use rest of rack and what is
-            # available on the table to look for additional tiles to place.
-            new_state = state.with_move(sol.tiles)
-            stage2 = self._solver(SolverMode.TILE_COUNT, new_state)
-            if stage2 is not None:
-                tiles = sorted(tiles + stage2.tiles)
-                set_indices = stage2.set_indices
+        Selects the mode like solve() does. The file extension picks the
+        format, .mps for MPS or .lp for CPLEX LP. The first line is a comment
+        recording the rules, the mode and the game state, so the position can
+        be solved again with load_problem().
 
-        return ProposedSolution(tiles, [self.sets[i] for i in set_indices])
+        """
+        comment = _PROBLEM_COMMENTS.get(path.suffix.lower())
+        if comment is None:
+            raise ValueError("Problems can only be exported to .mps or .lp files")
+        if mode is None:
+            mode = SolverMode.INITIAL if state.initial else SolverMode.TILE_COUNT
+        with self._checkout("export") as solver:
+            solver.export(mode, state, path)
+        details = {
+            "rules": {
+                "numbers": self.numbers,
+                "repeats": self.repeats,
+                "colours": self.colours,
+                "jokers": self.jokers,
+                "min_len": self.min_len,
+                "min_initial_value": self.min_initial_value,
+            },
+            "mode": mode.value,
+            "initial": state.initial,
+            "table": state.sorted_table,
+            "rack": state.sorted_rack,
+        }
+        header = f"{comment} {_PROBLEM_HEADER} {json.dumps(details)}\n"
+        path.write_text(header + path.read_text())
+
+    @classmethod
+    def load_problem(
+        cls, path: Path, **kwargs: Any
+    ) -> tuple[RuleSet, SolverMode, GameState]:
+        """Read the rules, mode and game state from an exported problem file
+
+        Extra keyword arguments are passed on to the ruleset, e.g. to pick a
+        solver backend. Raises ValueError if the file wasn't written by
+        export().
+
+        """
+        with path.open() as f:
+            _, found, details = f.readline().partition(_PROBLEM_HEADER)
+        if not found:
+            raise ValueError(f"{path} is not an exported problem")
+        data = json.loads(details)
+        ruleset = cls(**data["rules"], **kwargs)
+        state = GameState(ruleset.tile_count, data["table"], data["rack"])
+        state.initial = data["initial"]
+        return ruleset, SolverMode(data["mode"]), state
+
+    def _opening(
+        self,
+        state: GameState,
+        k: int,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> list[SolverSolution]:
+        """Find up to k opening turns for a game with tiles on the table"""
+        with self._checkout("opening") as solver:
+            return solver.opening(state, k, deadline, preset)
+
+    def _solutions(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        k: int,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> list[SolverSolution]:
+        """Find up to k solutions with distinct tile selections"""
+        with self._checkout("solutions") as solver:
+            return solver.solutions(mode, state, k, deadline, preset)
+
+    @contextmanager
+    def _checkout(self, method: Optional[str] = None) -> Iterator[Any]:
+        """Use a solver from the pool for the current backend
+
+        With a method name, a solver from the HiGHS solver pool is used if the
+        current backend doesn't implement the method. Not all backends
+        support opening turns, no-good cuts and the other problem variants
+        beyond the solver modes; these are handed off to a HiGHS solver
+        instead, which counts towards the same statistics.
+
+        The solver is not used by any other thread until the block exits.
+
+        """
+        pool = self._pool
+        if method is not None and not hasattr(self._solver, method):
+            pool = self._highs_pool
+        with pool.checkout() as solver:
+            yield solver
+
+    def pareto(self, state: GameState) -> list[ProposedSolution]:
+        """Find the best trade-offs between tiles placed and their value
+
+        Produces the solutions where you can't place more tiles without
+        placing less value, ordered from most tiles placed to highest value.
+        If the game is still in its initial state, these use only tiles from
+        the rack and meet the initial meld value.
+
+        """
+        with self._checkout("pareto") as solver:
+            front = solver.pareto(state)
+        return [ProposedSolution(sol.tiles, sol.sets) for sol in front]
 
     def arrange_table(self, state: GameState) -> TableArrangement:
         """Check if the tiles on the table can be arranged into sets
 
         Produces a series of sets and how many unattached jokers there are.
+        Without jokers on the table, the table is arranged one independent
+        component at a time, as with solve().
 
         """
-        table_only, joker = state.table_only(), self.joker
+        table_only, joker, joker_count = state.table_only(), self.joker, 0
         if joker is not None:
+            # move the jokers to the rack, the solver then places as few of
+            # these as are needed to arrange the table.
             joker_count = table_only.table[joker]
-            table_only.remove_table((self.joker,) * joker_count)
+            table_only.remove_table((joker,) * joker_count)
+            table_only.add_rack((joker,) * joker_count)
+
+        components = [table_only]
+        if self.decompose:
+            components = self._components(SolverMode.TILE_COUNT, table_only)
+        with self._checkout("arrange") as solver:
+            solutions = [solver.arrange(comp) for comp in components]
+        if all(sol.sets for sol in solutions):
+            sets = sorted(chain.from_iterable(sol.sets for sol in solutions))
+            placed = sum(len(sol.tiles) for sol in solutions)
+            return TableArrangement(sets, joker_count - placed)
+
+    def calibrate(self, count: int = 10, seed: int = 0) -> SolverBackend:
+        """Find the fastest solver backend for this ruleset
+
+        Times each backend on the same series of random game states, each
+        solved both before and after the player's initial meld, the way
+        solve() would solve them: the initial meld, an opening turn with tiles
+        on the table, or placing the most tiles. A backend is dropped as soon
+        as it takes longer than the fastest backend so far.
 
-        for jc in range(joker_count + 1):
-            if jc:
-                table_only.add_table((self.joker,))
-            sol = self._solver(SolverMode.TILE_COUNT, table_only)
-            if sol.set_indices:
-                return TableArrangement(
-                    [self.sets[s] for s in sol.set_indices], joker_count - jc
-                )
+        """
+        states = list(self._sample_states(count, seed))
+        best, best_time = self.backend, inf
+        for backend, factory in SOLVERS.items():
+            solver = self._solver if backend is self.backend else factory(self)
+            start = perf_counter()
+            for state, initial in product(states, (True, False)):
+                state.initial = initial
+                self._calibration_solve(solver, state)
+                if perf_counter() - start > best_time:
+                    break
+            else:
+                best, best_time = backend, perf_counter() - start
+        return best
+
+    def _calibration_solve(self, solver: Any, state: GameState) -> None:
+        """Solve a sample game state with a solver, as solve() would"""
+        if not state.initial:
+            solver(SolverMode.TILE_COUNT, state)
+        elif not state.table:
+            solver(SolverMode.INITIAL, state)
+        elif hasattr(solver, "opening"):
+            solver.opening(state)
+        else:
+            # opening turns are left to HiGHS, see _checkout()
+            with self._highs_pool.checkout() as highs:
+                highs.opening(state)
+
+    def _sample_states(self, count: int, seed: int) -> Iterator[GameState]:
+        """Produce random game states with a few sets on the table"""
+        rnd = random.Random(seed)
+        available = Counter({t: self.repeats for t in self.tiles})
+        if self.joker is not None:
+            available[self.joker] = self.jokers
+        for i in range(count):
+            pool, table = available.copy(), []
+            for s in rnd.sample(self.sets, i % 8):
+                if not Counter(s) - pool:
+                    pool -= Counter(s)
+                    table += s
+            tiles = sorted(pool.elements())
+            rack = rnd.sample(tiles, min(len(tiles), 6 + i % 10))
+            yield GameState(self.tile_count, table, rack)
 
     @cached_property
     def game_state_key(self) -> str:
@@ -125,8 +560,17 @@ class RuleSet:
     def sets(self) -> Sequence[tuple[int]]:
         return sorted(self._runs() | self._groups())
 
+    @cached_property
+    def base_sets(self) -> Sequence[tuple[int]]:
+        """All runs and groups made up of real tiles only"""
+        return sorted(self._runs(jokers=False) | self._groups(jokers=False))
+
     @cached_property
     def setvalues(self) -> Sequence[int]:
+        return [self.set_value(s) for s in self.sets]
+
+    @cached_property
+    def _run_values(self) -> Sequence[Sequence[int]]:
         n, mlen = self.numbers, self.min_len
         # generate a runlength value matrix indexed by [len(set)][min(set)],
         # giving total tile value for a given set accounting for jokers. e.g. a
@@ -136,38 +580,34 @@ class RuleSet:
         for i, rl in enumerate(range(1, mlen * 2)):
             tiles = chain(range(i, n + 1), repeat(n - i))
             rlvalues.append([v + t for v, t in zip(rlvalues[-1], tiles)])
+        return rlvalues
+
+    def set_value(self, s: Sequence[int]) -> int:
+        """Calculate sum of numeric value of tiles in set.
 
-        def _calc(
-            s: tuple[int],
-            _next: Callable[[Iterable[int]], int] = next,
-            _len: Callable[[Sized], int] = len,
-            joker: Optional[int] = self.joker,
-        ) -> int:
-            """Calculate sum of numeric value of tiles in set.
-
-            If there are jokers in the set the max possible value for the run or
-            group formed is used.
-
-            """
-            nums = ((t - 1) % n + 1 for t in s if t != joker)
-            try:
-                n0 = _next(nums)
-            except StopIteration:
-                # a set of all jokers. Use length times max number value
-                return _len(s) * n
-            try:
-                # n0 == n1: group of same numbers, else run of same colour
-                return _len(s) * n0 if n0 == _next(nums) else rlvalues[_len(s)][n0]
-            except StopIteration:
-                # len(nums) == 1, rest of set is jokers. Can be both a run or a
-                # group, e.g. (5, j, j): (5, 5, 5) = 15 or (5, 6, 7) = 18, and
-                # (13, j, j): (13, 13, 13) = 39 or (j, j, 13) = 36. Use max to
-                # pick best.
-                return max(_len(s) * n0, rlvalues[_len(s)][n0])
-
-        return [_calc(set) for set in self.sets]
-
-    def _runs(self) -> set[tuple[int]]:
+        If there are jokers in the set the max possible value for the run or
+        group formed is used.
+
+        """
+        n, joker = self.numbers, self.joker
+        nums = ((t - 1) % n + 1 for t in s if t != joker)
+        try:
+            n0 = next(nums)
+        except StopIteration:
+            # a set of all jokers. Use length times max number value
+            return len(s) * n
+        rlvalues = self._run_values
+        try:
+            # n0 == n1: group of same numbers, else run of same colour
+            return len(s) * n0 if n0 == next(nums) else rlvalues[len(s)][n0]
+        except StopIteration:
+            # len(nums) == 1, rest of set is jokers. Can be both a run or a
+            # group, e.g. (5, j, j): (5, 5, 5) = 15 or (5, 6, 7) = 18, and
+            # (13, j, j): (13, 13, 13) = 39 or (j, j, 13) = 36. Use max to
+            # pick best.
+            return max(len(s) * n0, rlvalues[len(s)][n0])
+
+    def _runs(self, jokers: bool = True) -> set[tuple[int]]:
         colours, ns = range(self.colours), self.numbers
         lengths = range(self.min_len, self.min_len * 2)
         # runs start at a given coloured tile, and are between min_len and
@@ -177,9 +617,11 @@ class RuleSet:
             for c, length in product(colours, lengths)
             for num in range(1, ns - length + 2)
         )
+        if not jokers:
+            return set(map(tuple, series))
         return self._combine_with_jokers(series, runs=True)
 
-    def _groups(self) -> set[tuple[int]]:
+    def _groups(self, jokers: bool = True) -> set[tuple[int]]:
         ns, cs = self.numbers, self.colours
         # groups are between min_len and #colours long, a group per possible
         # tile number value.
@@ -188,6 +630,8 @@ class RuleSet:
         groups = chain.from_iterable(
             combinations(fg, len) for fg, len in product(fullgroups, lengths)
         )
+        if not jokers:
+            return set(map(tuple, groups))
         return self._combine_with_jokers(groups)
 
     def _combine_with_jokers(
@@ -0,0 +1,20 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+from typing import Optional, Sequence
+
+
+def _run_tuple(
+    tiles: Sequence[int], min_len: int, joker: Optional[int]
+) -> tuple[int, ...]:
+    """Produce the set tuple for a run, in the same order as the ruleset sets
+
+    tiles are in number order, with jokers in the positions they fill.
+
+    """
+    if len(tiles) == min_len:
+        inner, first, last = tiles, (), ()
+    else:
+        # longer runs start and end with a real tile
+        inner, first, last = tiles[1:-1], tiles[:1], tiles[-1:]
+    real = [t for t in inner if t != joker]
+    return (*first, *real, *(joker,) * (len(inner) - len(real)), *last)
@@ -1,19 +1,306 @@
 # SPDX-License-Identifier: MIT
 from __future__ import annotations
+import os
+import pickle
+import platform
+import threading
+import warnings
+from collections import Counter
 from itertools import chain
-from typing import TYPE_CHECKING
+from math import inf
+from pathlib import Path
+from time import monotonic
+from typing import (
+    Any,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
+import cvxopt
+import cvxopt.glpk
 import cvxpy as cp
+import highspy
 import numpy as np
+import scipy
+from scipy import sparse
 
+from . import __version__
+from .colgensolver import ColumnGenerationSolver
+from .compactsolver import CompactSolver, JokerSlotSolver
 from .gamestate import GameState
-from .types import SolverMode, SolverSolution
+from .limits import _EXACT, _PRESETS, _Limits
+from .types import SolverBackend, SolverMode, SolverPreset, SolverSolution
 
 
 if TYPE_CHECKING:
     from .ruleset import RuleSet
 
 
+# Revision of the cvxpy problem definitions, bump when these change
+_PROBLEM_REVISION = 1
+# compiled problems cached on disk are only valid for these exact versions
+_CACHE_VERSIONS = (
+    _PROBLEM_REVISION,
+    __version__,
+    platform.python_version(),
+    cp.__version__,
+    cvxopt.__version__,
+    np.__version__,
+    scipy.__version__,
+)
+
+
+def _set_matrix(ruleset: RuleSet) -> np.ndarray:
+    """Set membership matrix for a ruleset
+
+    Gives how many copies of a given tile are present in a given set. Each
+    column is a set, each row a tile.
+
+    """
+    slen = len(ruleset.sets)
+    smatrix = np.zeros((ruleset.tile_count, slen), dtype=np.uint8)
+    np.add.at(
+        smatrix,
+        (
+            np.fromiter(chain.from_iterable(ruleset.sets), np.uint8) - 1,
+            np.repeat(
+                np.arange(slen), np.fromiter(map(len, ruleset.sets), np.uint16)
+            ),
+        ),
+        1,
+    )
+    return smatrix
+
+
+class _SetTiles:
+    """Tile counts per set, as flat arrays over the set matrix non-zeros
+
+    Answers the questions the greedy heuristic keeps asking about sets with
+    a handful of vectorized operations, without touching the (mostly zero)
+    dense set matrix.
+
+    """
+
+    def __init__(self, smatrix: sparse.spmatrix) -> None:
+        smatrix = sparse.csc_matrix(smatrix)
+        self.tcount, self.size = smatrix.shape
+        self._indptr = smatrix.indptr
+        self.tiles, self.counts = smatrix.indices, smatrix.data
+        self.sets = np.repeat(np.arange(self.size), np.diff(smatrix.indptr))
+        self.lengths = self.per_set(self.counts)
+
+    def per_set(self, values: np.ndarray) -> np.ndarray:
+        """Sum values given per non-zero, per set"""
+        return np.bincount(self.sets, weights=values, minlength=self.size)
+
+    def column(self, j: int) -> np.ndarray:
+        """Tile counts for set j"""
+        col = np.zeros(self.tcount)
+        entries = slice(self._indptr[j], self._indptr[j + 1])
+        col[self.tiles[entries]] = self.counts[entries]
+        return col
+
+    def fitting(self, available: np.ndarray) -> np.ndarray:
+        """Sets that can be formed from the available tiles"""
+        short = self.counts > available[self.tiles]
+        return np.bincount(self.sets[short], minlength=self.size) == 0
+
+    def containing(self, col: np.ndarray) -> np.ndarray:
+        """Sets holding at least the tiles in col"""
+        wanted = col[self.tiles]
+        held = (wanted > 0) & (self.counts >= wanted)
+        return np.bincount(self.sets[held], minlength=self.size) == (col > 0).sum()
+
+
+def _greedy_cover(
+    sets: _SetTiles, table: np.ndarray, rack: np.ndarray
+) -> Optional[np.ndarray]:
+    """Greedily arrange the tiles on the table into sets
+
+    Repeatedly takes the table tile with the fewest sets left to place it in,
+    and places it in the set covering the most remaining table tiles,
+    completed with as few rack tiles as possible. Returns the set counts, or
+    None if this leaves a tile that doesn't fit into any set.
+
+    """
+    counts = np.zeros(sets.size)
+    left, free = table.copy(), rack.astype(np.float64)
+    while left.any():
+        fits = sets.fitting(left + free)
+        options = np.bincount(sets.tiles[fits[sets.sets]], minlength=sets.tcount)
+        tile = np.argmin(np.where(left > 0, options, np.inf))
+        if not options[tile]:
+            return None
+        covered = sets.per_set(np.minimum(sets.counts, left[sets.tiles]))
+        score = covered * (sets.tcount + 1) - (sets.lengths - covered)
+        candidates = fits & sets.containing(np.eye(1, sets.tcount, tile)[0])
+        best = np.argmax(np.where(candidates, score, -np.inf))
+        counts[best] += 1
+        col = sets.column(best)
+        from_table = np.minimum(col, left)
+        left -= from_table
+        free -= col - from_table
+    return counts
+
+
+def _tile_values(ruleset: RuleSet) -> np.ndarray:
+    """Numeric value of each tile, jokers count as 0"""
+    tilevalue = np.tile(
+        np.arange(ruleset.numbers, dtype=np.uint16) + 1, ruleset.colours
+    )
+    if ruleset.jokers:
+        tilevalue = np.append(tilevalue, 0)
+    return tilevalue
+
+
+def _available(mode: SolverMode, state: GameState) -> np.ndarray:
+    """Per tile, how many copies are available to form sets with"""
+    if mode is SolverMode.INITIAL:
+        # can't use tiles on the table
+        return state.rack_array
+    return state.rack_array + state.table_array
+
+
+def _set_bounds(
+    smatrix: np.ndarray, available: np.ndarray, repeats: int
+) -> np.ndarray:
+    """Upper bound per set, given the available tile counts
+
+    A set can't be formed more often than the scarcest of its tiles allows,
+    jokers included, and never more than *repeats* times. Sets that can't be
+    formed at all get a bound of 0.
+
+    """
+    copies = np.where(smatrix, available[:, None] // np.maximum(smatrix, 1), repeats)
+    return np.minimum(copies.min(axis=0), repeats)
+
+
+def _record_bounds(stats: Counter[str], bounds: np.ndarray, repeats: int) -> None:
+    """Update solver statistics with the effect of set bound tightening"""
+    stats["sets"] += bounds.size
+    stats["sets_fixed"] += int(np.count_nonzero(bounds == 0))
+    tightened = np.count_nonzero((bounds > 0) & (bounds < repeats))
+    stats["bounds_tightened"] += int(tightened)
+
+
+def _solution(
+    tiles: np.ndarray,
+    sets: np.ndarray,
+    ruleset_sets: Sequence[tuple[int, ...]],
+    gap: float = 0.0,
+    milp_skipped: bool = False,
+) -> SolverSolution:
+    """Convert tile and set count arrays to a solver solution"""
+    # convert index counts to repeated indices, as Python scalars
+    # similar to what Counts.elements() produces.
+    (tidx,) = tiles.nonzero()
+    # add 1 to the indices to get tile numbers
+    selected_tiles = np.repeat(tidx + 1, tiles[tidx].astype(int)).tolist()
+
+    (sidx,) = sets.nonzero()
+    selected_sets = [
+        ruleset_sets[i] for i in np.repeat(sidx, sets[sidx].astype(int)).tolist()
+    ]
+
+    return SolverSolution(selected_tiles, selected_sets, gap, milp_skipped)
+
+
+# cvxpy sets the GLPK options for a solve globally and restores them after,
+# and GLPK reads them while it solves, so only one thread at a time can
+# solve with cvxpy and GLPK, whatever the RuleSet pool_size.
+_glpk_options = threading.Lock()
+
+# variable values and the relative optimality gap of a MILP solve
+_Solved = Tuple[np.ndarray, float]
+
+
+# HiGHS model statuses for a MILP solve cut short before it was done
+_HIGHS_LIMITS = {
+    highspy.HighsModelStatus.kTimeLimit,
+    highspy.HighsModelStatus.kIterationLimit,
+    highspy.HighsModelStatus.kSolutionLimit,
+    highspy.HighsModelStatus.kInterrupt,
+}
+_FEASIBLE = highspy.SolutionStatus.kSolutionStatusFeasible
+_OPTIMAL = highspy.HighsModelStatus.kOptimal
+# how far LP relaxation values can be from an integer and still count as one
+_INTEGRALITY_TOL = 1e-6
+
+# no-good cut rows: tile coefficients, binary coefficients, row bounds
+_Cuts = Tuple[sparse.csr_matrix, sparse.csr_matrix, np.ndarray, np.ndarray]
+
+
+class _HighsModel(NamedTuple):
+    """A HiGHS instance kept for the next solve with more no-good cuts"""
+
+    highs: highspy.Highs
+    # the variable upper bounds the model was built for
+    ub: np.ndarray
+    # the variables passed to HiGHS, those that can be non-zero
+    cols: np.ndarray
+    # the number of rows before any no-good cut rows
+    rows: int
+
+
+def _no_good_cuts(tile_ub: np.ndarray, excluded: Sequence[np.ndarray]) -> _Cuts:
+    """Constraint rows that exclude earlier tile selections
+
+    Tile counts are general integers, so each tile count x_t with an upper
+    bound u_t is expanded into binaries z_t,k = [x_t >= k] for k in 1..u_t
+    (x_t == sum(z_t), z_t,k >= z_t,k+1). A selection x^ is then excluded with
+    a single no-good cut over the binaries: sum(z where k > x^_t) - sum(z
+    where k <= x^_t) >= 1 - sum(x^).
+
+    Returns the coefficients for the tile variables and the binaries, and the
+    lower and upper bounds of the rows. The binaries themselves are bounded by
+    0 and 1.
+
+    """
+    tile_ub = tile_ub.astype(int)
+    tcount, zcount = tile_ub.size, int(tile_ub.sum())
+    # per binary, the tile it expands and its k (1-based)
+    ztile = np.repeat(np.arange(tcount), tile_ub)
+    zk = np.arange(zcount) - np.repeat(np.cumsum(tile_ub) - tile_ub, tile_ub) + 1
+
+    # x_t - sum(z_t) == 0, then z_t,k+1 - z_t,k <= 0
+    (linked,) = tile_ub.nonzero()
+    link_tiles = sparse.csr_matrix(
+        (np.ones(linked.size), (np.arange(linked.size), linked)),
+        shape=(linked.size, tcount),
+    )
+    link_z = sparse.csr_matrix(
+        (-np.ones(zcount), (np.searchsorted(linked, ztile), np.arange(zcount))),
+        shape=(linked.size, zcount),
+    )
+    (nxt,) = (zk > 1).nonzero()
+    order_z = sparse.csr_matrix(
+        (
+            np.concatenate([np.ones(nxt.size), -np.ones(nxt.size)]),
+            (np.tile(np.arange(nxt.size), 2), np.concatenate([nxt, nxt - 1])),
+        ),
+        shape=(nxt.size, zcount),
+    )
+    cuts = np.array([np.where(zk > sel[ztile], 1.0, -1.0) for sel in excluded]).reshape(
+        -1, zcount
+    )
+    cut_lb = [1.0 - sel.sum() for sel in excluded]
+
+    tiles = sparse.vstack(
+        [link_tiles, sparse.csr_matrix((nxt.size + len(excluded), tcount))],
+        format="csr",
+    )
+    binaries = sparse.vstack([link_z, order_z, sparse.csr_matrix(cuts)], format="csr")
+    row_lb = np.concatenate([np.zeros(linked.size), np.full(nxt.size, -np.inf), cut_lb])
+    row_ub = np.concatenate(
+        [np.zeros(linked.size + nxt.size), np.full(len(excluded), np.inf)]
+    )
+    return tiles, binaries, row_lb, row_ub
+
+
 class RummikubSolver:
     """Solvers for finding possible tile placements in Rummikub games
 
@@ -28,28 +315,42 @@ class RummikubSolver:
     joker handling in general.
 
     Creates cvxpy solvers *once* and use parameters to improve efficiency.
+    With presolve enabled on the ruleset, each set's upper bound is tightened
+    to the number of times it can be formed from the tiles on the rack and
+    table; GLPK removes sets with a bound of 0 from the problem before
+    branching. stats counts solves and the effect of the bound tightening.
+    If the ruleset has a cache directory, the compiled problems are stored
+    there and loaded again the next time the same rules are used, so even the
+    first solve doesn't have to wait for cvxpy to compile the problems.
 
     """
 
     def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self._smatrix = _set_matrix(ruleset)
+        self.stats: Counter[str] = Counter()
+        path = None
+        if ruleset.cache_dir is not None:
+            rules = (ruleset.game_state_key, ruleset.min_len, ruleset.min_initial_value)
+            path = ruleset.cache_dir / "problems_{}m{}v{}.pickle".format(*rules)
+            if self._load(path):
+                return
+        self._build(ruleset)
+        if path is not None:
+            self._save(path)
+
+    def _build(self, ruleset: RuleSet) -> None:
         # set membership matrix; how many copies of a given tile are present in
         # a given set. Each column is a set, each row a tile
-        slen = len(ruleset.sets)
-        smatrix = np.zeros((ruleset.tile_count, slen), dtype=np.uint8)
-        np.add.at(
-            smatrix,
-            (
-                np.fromiter(chain.from_iterable(ruleset.sets), np.uint8) - 1,
-                np.repeat(
-                    np.arange(slen), np.fromiter(map(len, ruleset.sets), np.uint16)
-                ),
-            ),
-            1,
-        )
+        smatrix = self._smatrix
 
-        # Input parameters: counts for each tile on the table and on the rack
+        # Input parameters: counts for each tile on the table and on the rack,
+        # and the upper bound for each set.
         table = self.table = cp.Parameter(ruleset.tile_count, "table", nonneg=True)
         rack = self.rack = cp.Parameter(ruleset.tile_count, "rack", nonneg=True)
+        sets_ub = self.sets_ub = cp.Parameter(
+            len(ruleset.sets), "sets_ub", nonneg=True
+        )
 
         # Output variables: counts per resulting set, and counts per
         # tile taken from the rack to be added to the table.
@@ -75,9 +376,10 @@ class RummikubSolver:
             # the selected tiles must all come from your rack
             tiles <= rack,
             # A given set could appear multiple times, but never more than
-            # *repeats* times.
+            # *repeats* times (sets_ub is set to this value when not
+            # presolving).
             0 <= sets,
-            sets <= ruleset.repeats,
+            sets <= sets_ub,
             # You can place multiple tiles with the same colour and number
             # but there are never more than *ruleset.repeats* of them.
             0 <= numbertiles,
@@ -91,11 +393,7 @@ class RummikubSolver:
         p[SolverMode.TILE_COUNT] = cp.Problem(cp.Maximize(cp.sum(tiles)), constraints)
 
         # Problem solver maximising the total value of tiles placed
-        tilevalue = np.tile(
-            np.arange(ruleset.numbers, dtype=np.uint16) + 1, ruleset.colours
-        )
-        if ruleset.jokers:
-            tilevalue = np.append(tilevalue, 0)
+        tilevalue = _tile_values(ruleset)
         p[SolverMode.TOTAL_VALUE] = cp.Problem(
             cp.Maximize(cp.sum(tiles @ tilevalue)), constraints
         )
@@ -115,12 +413,72 @@ class RummikubSolver:
 
         self._problems = p
 
-    def __call__(self, mode: SolverMode, state: GameState) -> SolverSolution:
+    def _load(self, path: Path) -> bool:
+        """Load compiled problems from a cache file
+
+        Returns False if there is no usable cache file.
+
+        """
+        try:
+            with path.open("rb") as f:
+                if pickle.load(f) != _CACHE_VERSIONS:
+                    return False
+                state = pickle.load(f)
+        except Exception:  # missing, truncated or otherwise unreadable
+            return False
+        (
+            self._problems,
+            self.table,
+            self.rack,
+            self.sets_ub,
+            self.sets,
+            self.tiles,
+        ) = state
+        return True
+
+    def _save(self, path: Path) -> None:
+        """Compile the problems and store them in a cache file"""
+        self.rack.value = self.table.value = np.zeros(self.rack.shape)
+        self.sets_ub.value = np.zeros(self.sets_ub.shape)
+        for prob in self._problems.values():
+            prob.get_problem_data(cp.GLPK_MI)
+        state = (
+            self._problems,
+            self.table,
+            self.rack,
+            self.sets_ub,
+            self.sets,
+            self.tiles,
+        )
+        tmp = path.with_suffix(".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open("wb") as f:
+                pickle.dump(_CACHE_VERSIONS, f)
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            # not being able to cache the problems is not fatal
+            tmp.unlink(missing_ok=True)
+
+    def __call__(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> SolverSolution:
         """Find a solution for the given game state
 
         Uses the appropriate objective for the given solver mode, and takes
         the rack tile count and table tile count from state.
 
+        With a deadline, a time.monotonic() value, GLPK stops when the time is
+        up and the best solution found so far is used. GLPK doesn't report a
+        bound on the optimum, so that solution has a gap of inf; if there is
+        no solution yet it places no tiles. The preset sets the MILP gap GLPK
+        stops at; GLPK has no node limit, and always presolves.
+
         """
 
         # set parameters
@@ -130,23 +488,1092 @@ class RummikubSolver:
             self.table.value = np.zeros_like(state.table_array)
         else:
             self.table.value = state.table_array
+        repeats = self._ruleset.repeats
+        sets_ub = np.full(self.sets_ub.shape, repeats)
+        if self._ruleset.presolve:
+            sets_ub = _set_bounds(self._smatrix, _available(mode, state), repeats)
+            _record_bounds(self.stats, sets_ub, repeats)
+        self.sets_ub.value = sets_ub
+        self.stats["solves"] += 1
 
+        limits = _PRESETS[preset]._replace(deadline=deadline)
+        options: dict[str, Any] = {}
+        if limits.gap:
+            options["mip_gap"] = limits.gap
         prob = self._problems[mode]
-        value = prob.solve(solver=cp.GLPK_MI)
+        try:
+            # cvxpy passes the options on through the global GLPK options
+            with _glpk_options, warnings.catch_warnings():
+                if deadline is not None:
+                    # GLPK takes the time limit in whole milliseconds; time
+                    # spent waiting for the lock counts against the deadline.
+                    tm_lim = max(int((deadline - monotonic()) * 1000), 1)
+                    options["tm_lim"] = tm_lim
+                # a solution cut short by the time limit is reported as
+                # inaccurate, which is expected here.
+                warnings.simplefilter("ignore", UserWarning)
+                value = prob.solve(solver=cp.GLPK_MI, **options)
+        except cp.error.SolverError:
+            # GLPK has no status for running out of time without a solution
+            if deadline is None or monotonic() < deadline:
+                raise
+            self.stats["deadlines_hit"] += 1
+            return SolverSolution((), (), inf)
         if np.isinf(value):
             # no solution for the problem (e.g. no combination of tiles on
             # the rack leads to a valid set or has enough points when opening)
             return SolverSolution((), ())
 
-        # convert index counts to repeated indices, as Python scalars
-        # similar to what Counts.elements() produces.
-        tiles = self.tiles.value
-        (tidx,) = tiles.nonzero()
-        # add 1 to the indices to get tile numbers
-        selected_tiles = np.repeat(tidx + 1, tiles[tidx].astype(int)).tolist()
+        # the objective values are integers, so a gap worth less than a single
+        # unit still proves the solution optimal.
+        gap = limits.gap if limits.gap * abs(value) >= 1 else 0.0
+        if prob.status == cp.OPTIMAL_INACCURATE:
+            # a feasible solution, the time limit was reached first
+            self.stats["deadlines_hit"] += 1
+            gap = inf
+        return _solution(self.tiles.value, self.sets.value, self._ruleset.sets, gap)
+
+
+class _MatrixSolver:
+    """Base for solvers that hand explicit constraint matrices to a MILP engine
+
+    Builds the same model as RummikubSolver *once* as (sparse) arrays. Only
+    the rack and table counts change between solves, subclasses implement
+    _solve() to pass these on to a specific solver engine.
+
+    Variables are the counts per resulting set, followed by the counts per tile
+    taken from the rack to be added to the table. Objectives are expressed as
+    minimization problems. With presolve enabled on the ruleset, each set's
+    upper bound is tightened to the number of times it can be formed from the
+    tiles on the rack and table. stats counts solves and the effect of the
+    bound tightening.
+
+    Solves can be given a deadline, a time.monotonic() value. The solver then
+    stops at the deadline and produces the best solution found so far, with
+    its optimality gap. The solve quality preset sets how far the MILP solver
+    goes to prove a solution is optimal.
+
+    The set counts of the last solution per mode are kept. Consecutive solves
+    in a game usually differ by only a few tiles, so these are projected onto
+    the next game state and, where still feasible, passed on as a starting
+    solution for engines that accept one.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        self._ruleset = ruleset
+        self.stats: Counter[str] = Counter()
+        self._last: dict[SolverMode, np.ndarray] = {}
+        self._dense_smatrix = _set_matrix(ruleset)
+        smatrix = self._smatrix = sparse.csr_matrix(
+            self._dense_smatrix, dtype=np.float64
+        )
+        self._slen, self._tcount = smatrix.shape[1], ruleset.tile_count
+        # initial meld set value per set, as a single constraint row
+        self._setvalue = sparse.hstack(
+            [
+                sparse.csr_matrix([ruleset.setvalues], dtype=np.float64),
+                sparse.csr_matrix((1, self._tcount)),
+            ]
+        )
+        self._min_initial_value = ruleset.min_initial_value
+
+        # A given set could appear multiple times, but never more than
+        # *repeats* times. The same applies to tiles, except for jokers, of
+        # which there are never more than *ruleset.jokers*.
+        ub = np.full(self._slen + self._tcount, ruleset.repeats, dtype=np.float64)
+        if ruleset.jokers:
+            ub[-1] = ruleset.jokers
+        self._ub = ub
+
+        # Objectives, negated to turn these into minimization problems.
+        tilecount = np.ones(self._tcount)
+        numbertiles = tilecount.copy()
+        if ruleset.jokers:
+            # the initial meld maximizes the tile count _without jokers_.
+            numbertiles[-1] = 0
+        objectives = {
+            SolverMode.TILE_COUNT: tilecount,
+            SolverMode.TOTAL_VALUE: _tile_values(ruleset).astype(np.float64),
+            SolverMode.INITIAL: numbertiles,
+        }
+        self._objectives = {
+            mode: np.concatenate([np.zeros(self._slen), -obj])
+            for mode, obj in objectives.items()
+        }
+
+        # Opening turn rows; placed sets can only be taken from selected rack
+        # tiles and what was already placed on the table, for the final
+        # arrangement and for the initial meld (taking nothing from the
+        # table), then the initial meld tiles can't exceed the tiles placed
+        # and the initial meld must be worth at least min_initial_value.
+        placed = sparse.hstack([self._smatrix, -sparse.eye(self._tcount)])
+        self._opening_placed = sparse.block_diag([placed, placed], format="csr")
+        meld_tiles = sparse.hstack(
+            [sparse.csr_matrix((self._tcount, self._slen)), sparse.eye(self._tcount)]
+        )
+        self._opening_meld = (
+            sparse.hstack([-meld_tiles, meld_tiles], format="csr"),
+            sparse.hstack([sparse.csr_matrix(self._setvalue.shape), self._setvalue]),
+        )
+
+    def __call__(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> SolverSolution:
+        """Find a solution for the given game state
+
+        Uses the appropriate objective for the given solver mode, and takes
+        the rack tile count and table tile count from state. See solutions()
+        for the deadline and preset.
+
+        """
+        return self.solutions(mode, state, 1, deadline, preset)[0]
+
+    def solutions(
+        self,
+        mode: SolverMode,
+        state: GameState,
+        k: int,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> list[SolverSolution]:
+        """Find the k best solutions with distinct tile selections
+
+        After each solve, a no-good cut excluding the tiles selected is added
+        to the problem and the problem is solved again. Produces fewer
+        solutions if there are no more tile selections to be found, or if the
+        deadline passes; if there is no solution at all the list holds a
+        single empty solution.
+
+        For the tile count, the LP relaxation is solved first. Its optimum is
+        often integral already, and is then taken as the first solution
+        without solving the MILP at all.
+
+        """
+        slen = self._slen
+        ub, table = self._bounds(mode, state)
+        limits = _PRESETS[preset]._replace(deadline=deadline)
+        self.stats["solves"] += 1
+        solutions: list[SolverSolution] = []
+        excluded: list[np.ndarray] = []
+        while len(solutions) < k:
+            cuts = _no_good_cuts(ub[slen:], excluded) if excluded else None
+            relaxed = None
+            if mode is SolverMode.TILE_COUNT and not excluded:
+                relaxed = self._solve_relaxation(mode, ub, table)
+            if relaxed is not None:
+                self.stats["milp_skipped"] += 1
+                solved: Optional[_Solved] = (relaxed, 0.0)
+            else:
+                # only the first solve has no cuts for a start to violate
+                rack = None if excluded else state.rack_array
+                solved = self._solve(mode, ub, table, cuts, limits, rack)
+            if solved is None:
+                break
+            counts, gap = np.rint(solved[0]).astype(int), solved[1]
+            if not excluded and gap < inf:
+                self._last[mode] = counts[:slen]
+            solutions.append(
+                _solution(
+                    counts[slen:],
+                    counts[:slen],
+                    self._ruleset.sets,
+                    gap,
+                    milp_skipped=relaxed is not None,
+                )
+            )
+            if self._expired(limits):
+                break
+            excluded.append(counts[slen:])
+        # no solution for the problem (e.g. no combination of tiles on the rack
+        # leads to a valid set or has enough points when opening)
+        return solutions or [SolverSolution((), ())]
+
+    def opening(
+        self,
+        state: GameState,
+        k: int = 1,
+        deadline: Optional[float] = None,
+        preset: SolverPreset = SolverPreset.EXACT,
+    ) -> list[SolverSolution]:
+        """Find the best opening turns for a game with tiles on the table
+
+        Solves the initial meld and the tiles placed after it as a single
+        problem: the initial meld is formed from rack tiles only and must
+        meet the minimal value, then the table and all placed tiles are
+        arranged into sets. Maximizes the number of tiles placed, breaking
+        ties on the number tiles in the initial meld.
+
+        The variables for the final arrangement are followed by a copy for
+        the initial meld. Produces up to k solutions with distinct tile
+        selections, best first, or an empty list if the initial meld can't
+        be made. Stops early when the deadline passes.
+
+        """
+        slen, tcount = self._slen, self._tcount
+        objective, ub, table = self._opening_problem(state)
+        limits = _PRESETS[preset]._replace(deadline=deadline)
+
+        solutions: list[SolverSolution] = []
+        excluded: list[np.ndarray] = []
+        while len(solutions) < k:
+            self.stats["solves"] += 1
+            cuts = (
+                _no_good_cuts(ub[slen : slen + tcount], excluded) if excluded else None
+            )
+            solved = self._solve_opening(objective, ub, table, cuts, limits)
+            if solved is None:
+                break
+            counts, gap = np.rint(solved[0]).astype(int), solved[1]
+            tiles = counts[slen : slen + tcount]
+            solutions.append(_solution(tiles, counts[:slen], self._ruleset.sets, gap))
+            if self._expired(limits):
+                break
+            excluded.append(tiles)
+        return solutions
+
+    def _opening_problem(
+        self, state: GameState
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Objective, variable upper bounds and table counts for opening()"""
+        ub, table = self._bounds(SolverMode.TILE_COUNT, state)
+        meld_ub, _ = self._bounds(SolverMode.INITIAL, state)
+        # all tiles placed first, initial meld tiles second
+        weight = state.rack_array.sum() + 1
+        objective = np.concatenate(
+            [
+                self._objectives[SolverMode.TILE_COUNT] * weight,
+                self._objectives[SolverMode.INITIAL],
+            ]
+        )
+        return objective, np.concatenate([ub, meld_ub]), table
+
+    def arrange(self, state: GameState) -> SolverSolution:
+        """Arrange the table into sets, placing as few rack tiles as possible
+
+        With the jokers from the table moved to the rack, this finds the
+        arrangement that leaves the most jokers free. Returns an empty
+        solution if the table can't be arranged into sets.
+
+        """
+        ub, table = self._bounds(SolverMode.TILE_COUNT, state)
+        self.stats["solves"] += 1
+        solved = self._solve_arrange(ub, table)
+        if solved is None:
+            return SolverSolution((), ())
+        counts = np.rint(solved[0]).astype(int)
+        slen = self._slen
+        return _solution(counts[slen:], counts[:slen], self._ruleset.sets)
+
+    def greedy(self, mode: SolverMode, state: GameState) -> SolverSolution:
+        """Quickly find a solution that may well not be the best one
+
+        A fast heuristic, meant to have something to show while the MILP is
+        solved. The solution has a gap of inf, as there is no bound on how
+        far from optimal it is. When opening, the solution only holds the
+        initial meld sets, and leaves the table as it is. Returns an empty
+        solution if the heuristic doesn't find anything to place.
+
+        """
+        ub, table = self._bounds(mode, state)
+        start = self._warm_start(mode, ub, table)
+        counts = self._greedy(mode, ub, table, state.rack_array, start)
+        if counts is None:
+            return SolverSolution((), ())
+        counts = counts.astype(int)
+        slen = self._slen
+        return _solution(counts[slen:], counts[:slen], self._ruleset.sets, inf)
+
+    def _warm_start(
+        self, mode: SolverMode, ub: np.ndarray, table: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Project the last solution for mode onto new bounds and table counts
+
+        Keeps the last sets as far as they can still be formed, and takes the
+        tiles that these sets add to the table from the rack. Returns None
+        when there is no last solution, or if the sets no longer cover the
+        table, need more tiles than the rack holds or (when opening) fall
+        short of the initial meld value.
+
+        Engines that start their MILP solve from this count how often it is
+        used with _record_warm_start().
+
+        """
+        last = self._last.get(mode)
+        if last is None:
+            return None
+        slen = self._slen
+        sets = np.minimum(last, ub[:slen])
+        tiles = self._smatrix @ sets - table
+        start = np.concatenate([sets, tiles])
+        if (
+            (tiles < 0).any()
+            or (tiles > ub[slen:]).any()
+            or mode is SolverMode.INITIAL
+            and (self._setvalue @ start)[0] < self._min_initial_value
+        ):
+            return None
+        return start
+
+    def _record_warm_start(
+        self, mode: SolverMode, start: Optional[np.ndarray]
+    ) -> None:
+        """Count a warm start produced by _warm_start(), or its rejection"""
+        if mode not in self._last:
+            return
+        if start is None:
+            self.stats["warm_starts_rejected"] += 1
+        else:
+            self.stats["warm_starts"] += 1
+
+    def _greedy(
+        self,
+        mode: SolverMode,
+        ub: np.ndarray,
+        table: np.ndarray,
+        rack: np.ndarray,
+        start: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        """Quickly find a valid solution, without any claim to optimality
+
+        Starts from start, the last solution as projected by _warm_start(), or
+        failing that from a greedy arrangement of the table tiles. Sets are
+        then extended with rack tiles into larger sets, and the remaining rack
+        tiles form new sets, each time picking the set that adds the most to
+        the objective.
+        When opening, new sets are picked on their initial meld value instead,
+        and the result must meet the minimal value.
+
+        Returns the variable values, or None if no arrangement was found.
+
+        """
+        slen = self._slen
+        (cols,) = ub[:slen].nonzero()
+        # only sets that can be formed from the available tiles at all
+        smatrix = self._smatrix[:, cols]
+        candidates = _SetTiles(smatrix)
+        if mode is SolverMode.INITIAL:
+            weights = self._setvalue.toarray()[0, cols]
+        else:
+            weights = smatrix.T @ -self._objectives[mode][slen:]
+        sets_ub = ub[cols]
+        if start is not None:
+            sets = start[cols]
+        elif mode is SolverMode.INITIAL:
+            sets = np.zeros(cols.size)
+        else:
+            sets = _greedy_cover(candidates, table, rack)
+            if sets is None:
+                return None
+        free = rack - (smatrix @ sets - table)
+
+        if mode is not SolverMode.INITIAL:
+            # extend each set with rack tiles, to the best set containing it
+            for j in np.repeat(np.arange(cols.size), sets.astype(int)):
+                col = candidates.column(j)
+                larger = (
+                    candidates.fitting(free + col)
+                    & candidates.containing(col)
+                    & (sets < sets_ub)
+                )
+                best = np.argmax(np.where(larger, weights, -np.inf))
+                if weights[best] > weights[j] and larger[best]:
+                    sets[j] -= 1
+                    sets[best] += 1
+                    free -= candidates.column(best) - col
+
+        # then form new sets from what is left on the rack
+        while True:
+            fits = candidates.fitting(free) & (sets < sets_ub)
+            if not fits.any():
+                break
+            best = np.argmax(np.where(fits, weights, -np.inf))
+            sets[best] += 1
+            free -= candidates.column(best)
+
+        if mode is SolverMode.INITIAL and weights @ sets < self._min_initial_value:
+            return None
+        x = np.zeros_like(ub)
+        x[cols] = sets
+        x[slen:] = rack - free
+        return x
+
+    def _expired(self, limits: _Limits) -> bool:
+        """Check if the deadline has passed, counting deadlines cut short"""
+        if not limits.expired():
+            return False
+        self.stats["deadlines_hit"] += 1
+        return True
+
+    def _bounds(
+        self, mode: SolverMode, state: GameState
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Variable upper bounds and table tile counts for a game state"""
+        slen = self._slen
+        ub = self._ub.copy()
+        # the selected tiles must all come from your rack
+        ub[slen:] = np.minimum(ub[slen:], state.rack_array)
+        if self._ruleset.presolve:
+            repeats = self._ruleset.repeats
+            bounds = _set_bounds(self._dense_smatrix, _available(mode, state), repeats)
+            _record_bounds(self.stats, bounds, repeats)
+            ub[:slen] = bounds
+        if mode is SolverMode.INITIAL:
+            # can't use tiles on the table, set all counts to 0
+            table = np.zeros(self._tcount)
+        else:
+            table = state.table_array.astype(np.float64)
+        return ub, table
+
+    def _solve(
+        self,
+        mode: SolverMode,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+        rack: Optional[np.ndarray] = None,
+    ) -> Optional[_Solved]:
+        """Solve for the given variable upper bounds and table tile counts
+
+        cuts, if given, are extra rows over the tile variables and a series of
+        binaries, as produced by _no_good_cuts().
+
+        limits sets the MILP gap, node limit, presolve and deadline, see
+        _Limits. rack, if given, holds the rack tile counts for engines that
+        start from a heuristic solution (see _greedy()); other engines ignore
+        it.
+
+        Returns the variable values and the relative optimality gap, or None
+        if there is no solution. If the deadline or node limit is reached
+        before a solution is found, the values are all 0 and the gap is inf.
+
+        """
+        raise NotImplementedError
+
+    def _solve_relaxation(
+        self, mode: SolverMode, ub: np.ndarray, table: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Solve the LP relaxation, see _solve()
+
+        Returns the variable values only if the LP optimum is integral, None
+        otherwise. Engines without a separate LP solve always return None.
+
+        """
+        return None
+
+    def _solve_opening(
+        self,
+        objective: np.ndarray,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+    ) -> Optional[_Solved]:
+        """Solve the opening turn problem, see opening() and _solve()"""
+        raise NotImplementedError
+
+    def _solve_arrange(self, ub: np.ndarray, table: np.ndarray) -> Optional[_Solved]:
+        """Solve for the fewest tiles placed, see arrange() and _solve()"""
+        raise NotImplementedError
+
+
+class HighsSolver(_MatrixSolver):
+    """Solver for finding possible tile placements, using HiGHS directly
+
+    Hands the constraint matrices straight to the HiGHS MILP solver, through
+    its Python bindings. Only the variable bounds and the constraint bounds
+    change between solves, so there is no per-solve canonicalization step.
+    Variables with an upper bound of 0 are left out of the problem entirely.
+
+    """
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        super().__init__(ruleset)
+        # Rows: placed sets can only be taken from selected rack tiles and what
+        # was already placed on the table (smatrix @ sets - tiles == table),
+        # followed by a single row for the initial meld set value.
+        placed = sparse.hstack([self._smatrix, -sparse.eye(self._tcount)])
+        self._constraints = sparse.vstack([placed, self._setvalue], format="csr")
+        # Opening turn: the final arrangement of the table and placed tiles,
+        # the initial meld formed from placed tiles only, the initial meld
+        # tiles can't exceed the tiles placed, and the initial meld set value.
+        self._opening_constraints = sparse.vstack(
+            [self._opening_placed, *self._opening_meld], format="csr"
+        )
+        # the HiGHS instance of the last MILP solve, see _milp()
+        self._model: Optional[_HighsModel] = None
+
+    def _solve(
+        self,
+        mode: SolverMode,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+        rack: Optional[np.ndarray] = None,
+    ) -> Optional[_Solved]:
+        start, start_stat = None, None
+        if rack is not None:
+            # the MILP is solved after all, so a starting solution pays off
+            start = self._warm_start(mode, ub, table)
+            self._record_warm_start(mode, start)
+            start_stat = "warm_starts_optimal" if start is not None else None
+            start = self._greedy(mode, ub, table, rack, start)
+            start_stat = start_stat or "greedy_starts_optimal"
+        row_lb, row_ub = self._rows(mode, table)
+        return self._milp(
+            self._objectives[mode],
+            self._constraints,
+            ub,
+            row_lb,
+            row_ub,
+            cuts,
+            limits,
+            start,
+            start_stat,
+        )
+
+    def _solve_relaxation(
+        self, mode: SolverMode, ub: np.ndarray, table: np.ndarray
+    ) -> Optional[np.ndarray]:
+        (cols,) = ub.nonzero()
+        if not cols.size:
+            return None
+        highs = _highs_model(
+            self._objectives[mode][cols],
+            self._constraints[:, cols],
+            ub[cols],
+            *self._rows(mode, table),
+            integer=False,
+        )
+        highs.run()
+        if highs.getModelStatus() != _OPTIMAL:
+            return None
+        values = np.asarray(highs.getSolution().col_value)
+        if not np.allclose(values, np.rint(values), rtol=0, atol=_INTEGRALITY_TOL):
+            return None
+        x = np.zeros_like(ub)
+        x[cols] = values
+        return x
+
+    def _solve_arrange(self, ub: np.ndarray, table: np.ndarray) -> Optional[_Solved]:
+        objective = -self._objectives[SolverMode.TILE_COUNT]
+        row_lb, row_ub = np.append(table, -np.inf), np.append(table, np.inf)
+        return self._milp(objective, self._constraints, ub, row_lb, row_ub)
+
+    def _milp(
+        self,
+        objective: np.ndarray,
+        constraints: sparse.csr_matrix,
+        ub: np.ndarray,
+        row_lb: np.ndarray,
+        row_ub: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+        start: Optional[np.ndarray] = None,
+        start_stat: Optional[str] = None,
+    ) -> Optional[_Solved]:
+        """Solve a problem over integer variables, the first sets and tiles
+
+        The no-good cuts apply to the tile variables following the first
+        block of set variables. A series of solves for the same upper bounds
+        (see solutions() and opening()) shares a single HiGHS instance, each
+        solve with more cuts only adds the new cut rows to it. The limits
+        become HiGHS options, with the time left until the deadline as the
+        time limit. start, if given, is a feasible solution HiGHS starts
+        from; the start_stat statistic counts how often it was already
+        optimal.
+
+        """
+        (cols,) = ub.nonzero()
+        if not cols.size:
+            # nothing can be placed, so there is nothing to solve either
+            return None
+        objective = objective[cols]
+        model = self._model
+        if cuts is None or model is None or model.ub is not ub:
+            highs = _highs_model(
+                objective, constraints[:, cols], ub[cols], row_lb, row_ub
+            )
+            model = self._model = _HighsModel(highs, ub, cols, highs.getNumRow())
+        if cuts is not None:
+            self._add_cuts(model, cuts)
+        highs = model.highs
+        highs.setOptionValue("mip_rel_gap", limits.gap)
+        highs.setOptionValue("presolve", "on" if limits.presolve else "off")
+        if limits.nodes is not None:
+            highs.setOptionValue("mip_max_nodes", limits.nodes)
+        if limits.deadline is not None:
+            highs.setOptionValue("time_limit", max(limits.deadline - monotonic(), 0.0))
+        if start is not None:
+            solution = highspy.HighsSolution()
+            solution.col_value = start[cols]
+            solution.value_valid = True
+            highs.setSolution(solution)
+        highs.run()
+        info = highs.getInfo()
+        self.stats["nodes"] += info.mip_node_count
+        if info.primal_solution_status != _FEASIBLE:
+            if highs.getModelStatus() in _HIGHS_LIMITS:
+                # out of time or nodes before finding a better solution
+                return (np.zeros_like(ub) if start is None else start), inf
+            return None
+        x = np.zeros_like(ub)
+        x[cols] = highs.getSolution().col_value[: cols.size]
+        if start_stat and start is not None and highs.getModelStatus() == _OPTIMAL:
+            start_value = objective[: cols.size] @ start[cols]
+            if np.isclose(start_value, info.objective_function_value):
+                # the start was already optimal, the solver only had to prove it
+                self.stats[start_stat] += 1
+        return x, max(info.mip_gap, 0.0)
+
+    def _add_cuts(self, model: _HighsModel, cuts: _Cuts) -> None:
+        """Extend a HiGHS model with the no-good cut rows it doesn't have yet
+
+        The first cuts add the binaries for the tile variables, together with
+        the rows linking them; later cuts only add their own row.
+
+        """
+        highs, ub, cols = model.highs, model.ub, model.cols
+        tiles, binaries, cut_lb, cut_ub = cuts
+        zcount = binaries.shape[1]
+        if highs.getNumCol() == cols.size:
+            highs.addCols(
+                zcount,
+                np.zeros(zcount),
+                np.zeros(zcount),
+                np.ones(zcount),
+                0,
+                np.zeros(zcount, dtype=np.int32),
+                np.zeros(0, dtype=np.int32),
+                np.zeros(0),
+            )
+            highs.changeColsIntegrality(
+                zcount,
+                np.arange(cols.size, cols.size + zcount, dtype=np.int32),
+                np.ones(zcount, dtype=np.uint8),
+            )
+        new = slice(highs.getNumRow() - model.rows, None)
+        cut_rows = sparse.hstack(
+            [
+                sparse.csr_matrix((tiles.shape[0], self._slen)),
+                tiles,
+                sparse.csr_matrix(
+                    (tiles.shape[0], ub.size - self._slen - self._tcount)
+                ),
+            ],
+            format="csr",
+        )
+        rows = sparse.hstack([cut_rows[new][:, cols], binaries[new]], format="csr")
+        inf = highspy.kHighsInf
+        highs.addRows(
+            rows.shape[0],
+            np.where(np.isfinite(cut_lb[new]), cut_lb[new], -inf),
+            np.where(np.isfinite(cut_ub[new]), cut_ub[new], inf),
+            rows.nnz,
+            rows.indptr[:-1].astype(np.int32),
+            rows.indices.astype(np.int32),
+            rows.data.astype(np.float64),
+        )
+
+    def _solve_opening(
+        self,
+        objective: np.ndarray,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+    ) -> Optional[_Solved]:
+        row_lb, row_ub = self._opening_rows(table)
+        constraints = self._opening_constraints
+        return self._milp(objective, constraints, ub, row_lb, row_ub, cuts, limits)
+
+    def _rows(
+        self, mode: SolverMode, table: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Lower and upper row bounds for the solver mode problems"""
+        minvalue = self._min_initial_value if mode is SolverMode.INITIAL else -np.inf
+        return np.append(table, minvalue), np.append(table, np.inf)
+
+    def _opening_rows(self, table: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Lower and upper row bounds for the opening turn problem"""
+        tcount = self._tcount
+        zeros = np.zeros(tcount)
+        minvalue = self._min_initial_value
+        row_lb = np.concatenate([table, zeros, np.full(tcount, -np.inf), [minvalue]])
+        row_ub = np.concatenate([table, zeros, zeros, [np.inf]])
+        return row_lb, row_ub
+
+    def export(self, mode: SolverMode, state: GameState, path: Path) -> None:
+        """Write the problem HiGHS is given for a game state to a file
+
+        The file extension picks the format: .mps for (free) MPS, .lp for
+        CPLEX LP. The problem is exactly what a solve hands to HiGHS, with
+        the variables that can't be non-zero left out. In initial mode with
+        tiles on the table, this is the opening turn problem (see opening()).
+
+        """
+        if mode is SolverMode.INITIAL and state.table:
+            objective, ub, table = self._opening_problem(state)
+            constraints = self._opening_constraints
+            row_lb, row_ub = self._opening_rows(table)
+        else:
+            ub, table = self._bounds(mode, state)
+            objective, constraints = self._objectives[mode], self._constraints
+            row_lb, row_ub = self._rows(mode, table)
+        (cols,) = ub.nonzero()
+        highs = _highs_model(
+            objective[cols], constraints[:, cols], ub[cols], row_lb, row_ub
+        )
+        if highs.writeModel(str(path)) == highspy.HighsStatus.kError:
+            raise OSError(f"Can't write the problem to {path}")
+
+    def pareto(self, state: GameState) -> list[SolverSolution]:
+        """Find the solutions that trade off tiles placed against their value
+
+        Produces the non-dominated (tile count, tile value) solutions, from
+        most tiles to highest value, using an epsilon-constraint sweep: each
+        step maximizes the number of tiles placed (breaking ties on value)
+        with the value constrained to exceed that of the previous step. The
+        problem is passed to a single HiGHS instance, each step only changes
+        the bound on the value row.
+
+        If the game is still in its initial state, only sets formed from the
+        rack count and these must meet the initial meld value.
+
+        """
+        mode = SolverMode.INITIAL if state.initial else SolverMode.TILE_COUNT
+        slen, tcount = self._slen, self._tcount
+        ub, table = self._bounds(mode, state)
+        (cols,) = ub.nonzero()
+        if not cols.size:
+            return []
+
+        # tile count first, value second: a single tile outweighs the value
+        # of all tiles on the rack.
+        tilevalue = np.append(np.zeros(slen), _tile_values(self._ruleset))
+        weight = state.rack_array @ tilevalue[slen:] + 1
+        objective = self._objectives[SolverMode.TILE_COUNT] * weight - tilevalue
+        minvalue = self._min_initial_value if mode is SolverMode.INITIAL else -np.inf
+        constraints = sparse.vstack([self._constraints, tilevalue], format="csc")
+        value_row = constraints.shape[0] - 1
+        highs = _highs_model(
+            objective[cols],
+            constraints[:, cols],
+            ub[cols],
+            np.concatenate([table, [minvalue, -np.inf]]),
+            np.concatenate([table, [np.inf, np.inf]]),
+        )
+
+        solutions: list[SolverSolution] = []
+        while True:
+            self.stats["solves"] += 1
+            highs.run()
+            self.stats["nodes"] += highs.getInfo().mip_node_count
+            if highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+                break
+            counts = np.zeros(slen + tcount, dtype=int)
+            counts[cols] = np.rint(highs.getSolution().col_value)
+            if not counts[slen:].any():
+                break
+            solutions.append(
+                _solution(counts[slen:], counts[:slen], self._ruleset.sets)
+            )
+            value = counts @ tilevalue
+            highs.changeRowBounds(value_row, value + 1, highspy.kHighsInf)
+        return solutions
+
+
+# keys for the opening turn and table arrangement problems in CvxoptSolver,
+# next to the solver modes
+_OPENING, _ARRANGE = "opening", "arrange"
+_CvxoptProblem = Union[SolverMode, str]
+
+
+class CvxoptSolver(_MatrixSolver):
+    """Solver for finding possible tile placements, using cvxopt.glpk directly
+
+    Precomputes the cvxopt G, h, A and b matrices for each solver mode, and
+    per solve only patches the variable upper bounds and table right-hand-side
+    vectors in place before calling cvxopt.glpk.ilp. This skips the cvxpy
+    parameter canonicalization step entirely. The same goes for the opening
+    turn problem, which also has its objective patched in per solve.
+
+    """
+
+    _options = {"msg_lev": "GLP_MSG_OFF"}
+    _anchors = 2
+
+    def __init__(self, ruleset: RuleSet) -> None:
+        super().__init__(ruleset)
+        slen, tcount = self._slen, self._tcount
+        # GLPK 4.65 aborts the process when its MIP presolver manages to
+        # eliminate *all* columns ("glp_add_cols: ncs = 0"), which happens for
+        # trivially determined problems. Two anchor variables bound together
+        # in a single equality row (a0 + a1 == 1) survive presolve and avoid
+        # this.
+        anchors = self._anchors
+        nvars = slen + tcount + anchors
+
+        # Gx <= h: upper bounds for all variables (set and tile upper bounds
+        # are patched in per solve), followed by the lower bounds (all 0).
+        eye = sparse.eye(nvars)
+        bounds = sparse.vstack([eye, -eye])
+        bounds_h = np.concatenate([self._ub, np.ones(anchors), np.zeros(nvars)])
+        # the initial meld must be worth at least min_initial_value points.
+        initial = sparse.vstack(
+            [bounds, sparse.hstack([-self._setvalue, sparse.csr_matrix((1, anchors))])]
+        )
+        initial_h = np.append(bounds_h, -self._min_initial_value)
+
+        # Ax = b: placed sets can only be taken from selected rack tiles and
+        # what was already placed on the table (smatrix @ sets - tiles == table)
+        # plus the anchor row.
+        A = sparse.block_diag(
+            [
+                sparse.hstack([self._smatrix, -sparse.eye(tcount)]),
+                np.ones((1, anchors)),
+            ],
+            format="csr",
+        )
+
+        self._problems: dict[_CvxoptProblem, tuple[Any, ...]] = {}
+        # G and A as scipy matrices, to extend with no-good cuts
+        self._matrices: dict[_CvxoptProblem, tuple[sparse.csr_matrix, ...]] = {}
+        # writable numpy views on the cvxopt variable upper bound and table
+        # vectors, per mode
+        self._ub_views: dict[_CvxoptProblem, np.ndarray] = {}
+        self._table_views: dict[_CvxoptProblem, np.ndarray] = {}
+        for mode in SolverMode:
+            G, h = bounds, bounds_h
+            if mode is SolverMode.INITIAL:
+                G, h = initial, initial_h
+            c = np.append(self._objectives[mode], np.zeros(anchors))
+            self._add_problem(mode, c, G, h, A, np.zeros(tcount))
+        # arranging the table, placing as few tiles as possible, see arrange()
+        c = np.append(-self._objectives[SolverMode.TILE_COUNT], np.zeros(anchors))
+        self._add_problem(_ARRANGE, c, bounds, bounds_h, A, np.zeros(tcount))
+
+        # The opening turn problem, see opening(). The objective depends on
+        # the rack, so is patched in per solve as well.
+        nvars = 2 * (slen + tcount) + anchors
+        eye = sparse.eye(nvars)
+        G = sparse.vstack(
+            [
+                eye,
+                -eye,
+                *(
+                    sparse.hstack([row, sparse.csr_matrix((row.shape[0], anchors))])
+                    for row in (self._opening_meld[0], -self._opening_meld[1])
+                ),
+            ]
+        )
+        h = np.concatenate(
+            [
+                np.tile(self._ub, 2),
+                np.ones(anchors),
+                np.zeros(nvars + tcount),
+                [-self._min_initial_value],
+            ]
+        )
+        A = sparse.block_diag(
+            [self._opening_placed, np.ones((1, anchors))], format="csr"
+        )
+        self._add_problem(_OPENING, np.zeros(nvars), G, h, A, np.zeros(2 * tcount))
+        self._c_view = np.asarray(self._problems[_OPENING][0])[: nvars - anchors, 0]
+
+    def _add_problem(
+        self,
+        key: _CvxoptProblem,
+        c: np.ndarray,
+        G: sparse.spmatrix,
+        h: np.ndarray,
+        A: sparse.csr_matrix,
+        b: np.ndarray,
+    ) -> None:
+        """Convert a problem to cvxopt matrices, the anchor row is added to b"""
+        c, h, b = map(cvxopt.matrix, (c, h, np.append(b, 1.0)))
+        self._problems[key] = (c, _spmatrix(G), h, _spmatrix(A), b)
+        self._matrices[key] = (G.tocsr(), A)
+        nvars = G.shape[1]
+        self._ub_views[key] = np.asarray(h)[: nvars - self._anchors, 0]
+        self._table_views[key] = np.asarray(b)[: self._tcount, 0]
+
+    def _solve(
+        self,
+        mode: SolverMode,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+        rack: Optional[np.ndarray] = None,
+    ) -> Optional[_Solved]:
+        # GLPK, as wrapped by cvxopt, has no way to pass in a starting solution
+        return self._ilp(mode, ub, table, cuts, limits)
+
+    def _solve_opening(
+        self,
+        objective: np.ndarray,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+    ) -> Optional[_Solved]:
+        self._c_view[:] = objective
+        return self._ilp(_OPENING, ub, table, cuts, limits)
+
+    def _solve_arrange(self, ub: np.ndarray, table: np.ndarray) -> Optional[_Solved]:
+        return self._ilp(_ARRANGE, ub, table)
+
+    def _ilp(
+        self,
+        key: _CvxoptProblem,
+        ub: np.ndarray,
+        table: np.ndarray,
+        cuts: Optional[_Cuts] = None,
+        limits: _Limits = _EXACT,
+    ) -> Optional[_Solved]:
+        """Patch the bounds of a problem and solve it with GLPK
+
+        GLPK doesn't report a bound on the optimum when it reaches its time
+        limit, so solutions cut short by the deadline have a gap of inf. GLPK
+        has no node limit, and its presolver is always used (see __init__).
+        Solutions found with a MILP gap get that gap as their bound.
+
+        """
+        self._ub_views[key][:] = ub
+        self._table_views[key][:] = table
+        problem = self._problems[key]
+        if cuts is not None:
+            problem = self._with_cuts(key, cuts)
+        integers = set(range(problem[0].size[0]))
+        options = {**self._options, "mip_gap": limits.gap}
+        if limits.deadline is not None:
+            # GLPK takes the time limit in whole milliseconds
+            tm_lim = max(int((limits.deadline - monotonic()) * 1000), 1)
+            options["tm_lim"] = tm_lim
+        status, x = cvxopt.glpk.ilp(*problem, I=integers, options=options)
+        if status == "optimal":
+            # the objective values are integers, so a gap worth less than a
+            # single unit still proves the solution optimal.
+            gap = limits.gap
+            if gap * abs((problem[0].T * x)[0]) < 1:
+                gap = 0.0
+            return np.asarray(x)[: ub.size, 0], gap
+        if status == "feasible":
+            return np.asarray(x)[: ub.size, 0], inf
+        if limits.deadline is not None and monotonic() >= limits.deadline:
+            return np.zeros_like(ub), inf
+        return None
+
+    def _with_cuts(self, key: _CvxoptProblem, cuts: _Cuts) -> tuple[Any, ...]:
+        """A problem extended with no-good cut rows
+
+        The cut binaries are added as extra variables after the anchors. Cut
+        rows with equal bounds become equality rows, the others are added to
+        the inequality rows.
+
+        """
+        c, _, h, _, b = self._problems[key]
+        G, A = self._matrices[key]
+        tiles, binaries, row_lb, row_ub = cuts
+        nvars, zcount = G.shape[1], binaries.shape[1]
+        rows = sparse.hstack(
+            [
+                sparse.csr_matrix((tiles.shape[0], self._slen)),
+                tiles,
+                sparse.csr_matrix((tiles.shape[0], nvars - self._slen - self._tcount)),
+                binaries,
+            ],
+            format="csr",
+        )
+        eq = row_lb == row_ub
+        upper, lower = ~eq & np.isfinite(row_ub), ~eq & np.isfinite(row_lb)
+        zbounds = sparse.hstack(
+            [
+                sparse.csr_matrix((2 * zcount, nvars)),
+                sparse.vstack([sparse.eye(zcount), -sparse.eye(zcount)]),
+            ]
+        )
+        G = sparse.vstack(
+            [
+                sparse.hstack([G, sparse.csr_matrix((G.shape[0], zcount))]),
+                zbounds,
+                rows[upper],
+                -rows[lower],
+            ]
+        )
+        h = np.concatenate(
+            [
+                np.asarray(h)[:, 0],
+                np.ones(zcount),
+                np.zeros(zcount),
+                row_ub[upper],
+                -row_lb[lower],
+            ]
+        )
+        A = sparse.vstack(
+            [sparse.hstack([A, sparse.csr_matrix((A.shape[0], zcount))]), rows[eq]]
+        )
+        b = np.append(np.asarray(b)[:, 0], row_ub[eq])
+        c = cvxopt.matrix(np.append(np.asarray(c)[:, 0], np.zeros(zcount)))
+        return (c, _spmatrix(G), cvxopt.matrix(h), _spmatrix(A), cvxopt.matrix(b))
+
+
+def _highs_model(
+    cost: np.ndarray,
+    constraints: sparse.spmatrix,
+    col_ub: np.ndarray,
+    row_lb: np.ndarray,
+    row_ub: np.ndarray,
+    integer: bool = True,
+) -> highspy.Highs:
+    """Pass a minimization problem to a HiGHS instance
+
+    The variables are integers, or continuous for an LP relaxation.
+
+    """
+    highs = highspy.Highs()
+    highs.setOptionValue("output_flag", False)
+    a = sparse.csc_matrix(constraints, dtype=np.float64)
+    inf = highspy.kHighsInf
+    highs.passModel(
+        *a.shape[::-1],
+        a.nnz,
+        highspy.MatrixFormat.kColwise,
+        highspy.ObjSense.kMinimize,
+        0.0,
+        np.asarray(cost, dtype=np.float64),
+        np.zeros(a.shape[1]),
+        np.asarray(col_ub, dtype=np.float64),
+        np.where(np.isfinite(row_lb), row_lb, -inf),
+        np.where(np.isfinite(row_ub), row_ub, inf),
+        a.indptr,
+        a.indices,
+        a.data,
+        np.full(a.shape[1], int(integer), dtype=np.int32),
+    )
+    return highs
+
+
+def _spmatrix(m: sparse.spmatrix) -> cvxopt.spmatrix:
+    """Convert a scipy sparse matrix to a cvxopt sparse matrix"""
+    m = m.tocoo()
+    return cvxopt.spmatrix(
+        m.data.astype(np.float64), m.row.tolist(), m.col.tolist(), size=m.shape
+    )
 
-        sets = self.sets.value
-        (sidx,) = sets.nonzero()
-        selected_sets = np.repeat(sidx, sets[sidx].astype(int)).tolist()
 
-        return SolverSolution(selected_tiles, selected_sets)
+SOLVERS = {
+    SolverBackend.GLPK: RummikubSolver,
+    SolverBackend.HIGHS: HighsSolver,
+    SolverBackend.CVXOPT: CvxoptSolver,
+    SolverBackend.COMPACT: CompactSolver,
+    SolverBackend.JOKER_SLOTS: JokerSlotSolver,
+    SolverBackend.COLGEN: ColumnGenerationSolver,
+}
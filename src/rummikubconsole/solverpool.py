@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+import queue
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+
+class SolverPool:
+    """Independent solver instances, each used by a single caller at a time
+
+    Solvers keep state between the input and the solve (the cvxpy
+    parameters for the rack and table, for example), so concurrent solves
+    each need their own solver instance. Instances are created as callers
+    check them out, up to size instances; once that many are in use,
+    callers wait for an instance to be checked back in.
+
+    All instances share the stats counter, by default the statistics
+    counter of the first instance.
+
+    A pool doesn't make every backend solve in parallel: cvxpy hands its
+    options to GLPK through global settings, so the GLPK backend solves one
+    problem at a time across all its instances.
+
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 1,
+        stats: Optional[Counter[str]] = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("A solver pool needs room for at least one solver")
+        self._factory = factory
+        self.size = size
+        self._stats = stats
+        self._idle: queue.LifoQueue[Any] = queue.LifoQueue()
+        self._solvers: list[Any] = []
+        self._lock = threading.Lock()
+
+    @property
+    def first(self) -> Any:
+        """The first solver instance, created if needed"""
+        with self._lock:
+            if not self._solvers:
+                self._idle.put(self._create())
+            return self._solvers[0]
+
+    @contextmanager
+    def checkout(self) -> Iterator[Any]:
+        """Use a solver instance, exclusively, for the duration of the block"""
+        solver: Optional[Any] = None
+        try:
+            solver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._solvers) < self.size:
+                    solver = self._create()
+            if solver is None:
+                solver = self._idle.get()
+        try:
+            yield solver
+        finally:
+            self._idle.put(solver)
+
+    def _create(self) -> Any:
+        """Create a new solver instance, the pool lock must be held"""
+        solver = self._factory()
+        if self._stats is None:
+            self._stats = solver.stats
+        solver.stats = self._stats
+        self._solvers.append(solver)
+        return solver
@@ -90,19 +90,48 @@ class SolverMode(Enum):
     TOTAL_VALUE = "value"
 
 
+class SolverBackend(Enum):
+    GLPK = "glpk"  # cvxpy with the GLPK_MI solver
+    HIGHS = "highs"  # HiGHS via highspy
+    CVXOPT = "cvxopt"  # GLPK via cvxopt.glpk, skipping cvxpy
+    COMPACT = "compact"  # runs as flows over the tile numbers, HiGHS
+    JOKER_SLOTS = "jokerslots"  # sets of real tiles plus joker slots, HiGHS
+    COLGEN = "colgen"  # column generation, sets priced in on demand, HiGHS
+
+
+class SolverPreset(Enum):
+    """Solve quality presets, trading optimality for speed"""
+
+    EXACT = "exact"  # proven optimal solutions
+    BALANCED = "balanced"  # within 0.1% of the optimum, bounded search
+    FAST = "fast"  # within 1% of the optimum, short search, no MILP presolve
+
+
 class SolverSolution(NamedTuple):
-    """Raw solver solution, containing tile values and set indices"""
+    """Raw solver solution, containing tile values and the sets formed"""
 
     tiles: Sequence[int]
-    # indices into the ruleset sets list
-    set_indices: Sequence[int]
+    # sets formed, in the same form as the ruleset sets
+    sets: Sequence[tuple[int, ...]]
+    # relative optimality gap, 0 for proven optimal solutions; inf if the solve
+    # was cut short without a bound on the optimum.
+    gap: float = 0.0
+    # True if the LP relaxation was already integral, so the MILP wasn't solved
+    milp_skipped: bool = False
 
 
 class ProposedSolution(NamedTuple):
-    """Proposed next move to make for a given game state"""
+    """Proposed next move to make for a given game state
+
+    The gap is the proven relative optimality gap: 0 when no better move is
+    possible, larger when the solver stopped at a deadline before proving
+    this, and inf when there is no bound on how much better a move could be.
+
+    """
 
     tiles: Sequence[int]
     sets: Sequence[tuple[int]]
+    gap: float = 0.0
 
 
 class TableArrangement(NamedTuple):